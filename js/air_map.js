@@ -4,7 +4,8 @@ class AirCongestionMap {
       zoomControl: false
     }).setView([37.8, -96], 4);
 
-    this.allMarkers = L.markerClusterGroup({
+    // Shared by the precomputed clusters and the markercluster fallback
+    this.clusterOptions = {
       maxClusterRadius: 40,
       disableClusteringAtZoom: 9,
       spiderfyOnMaxZoom: true,
@@ -12,11 +13,11 @@ class AirCongestionMap {
       showCoverageOnHover: false,
       showCoverageOnClick: false,
 
+      clusterIcon: (count, level) => this.createClusterIcon(count, level),
       iconCreateFunction: (cluster) => {
         const childMarkers = cluster.getAllChildMarkers();
         let highestTXOValue = -1;
         let dominantLevel = 'Average';
-        let dominantColor = this.getColor(dominantLevel);
 
         childMarkers.forEach(marker => {
           const itemData = marker.options.itemData;
@@ -24,21 +25,14 @@ class AirCongestionMap {
             if (itemData.average_txo > highestTXOValue) {
               highestTXOValue = itemData.average_txo;
               dominantLevel = this.getCongestionLevelByTXO(itemData.average_txo);
-              dominantColor = this.getColor(dominantLevel);
             }
           }
         });
 
-        const childCount = cluster.getChildCount();
-        const size = 30 + Math.min(childCount * 0.5, 30);
-
-        return new L.DivIcon({
-          html: `<div style="background-color: ${dominantColor}; width: ${size}px; height: ${size}px; line-height: ${size}px; border-radius: 50%; color: white; font-weight: bold; text-align: center; display: flex; align-items: center; justify-content: center;"><span>${childCount}</span></div>`,
-          className: 'marker-cluster-custom',
-          iconSize: new L.Point(size, size)
-        });
+        return this.createClusterIcon(cluster.getChildCount(), dominantLevel);
       }
-    });
+    };
+    this.allMarkers = L.markerClusterGroup(this.clusterOptions);
 
     this.currentData = null;
     this.filterControlInstance = null;
@@ -143,13 +137,19 @@ class AirCongestionMap {
 
   async loadData() {
     try {
-      const response = await fetch('data/us-air.json');
+      const [response, layout, clusters] = await Promise.all([
+        fetch('data/us-air.json'),
+        loadLayout('data/us-air.layout.json'),
+        loadClusters('data/us-air.clusters.json')
+      ]);
       if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-      const rawData = await response.json();
+      const rawData = decodePayload(await response.json());
+      // Coincident airports are fanned out and the dropdown is sorted at publish time
+      this.layout = matchLayout(layout, rawData);
 
-      let processedData = rawData.map(item => ({
-        lat: item.latitude_deg,
-        lng: item.longitude_deg,
+      this.currentData = rawData.map((item, index) => ({
+        ...displayPoint(this.layout, index, item.latitude_deg, item.longitude_deg),
+        sourceIndex: index,
         Airport: item.airport_code,
         name: item.name,
         municipality: item.municipality,
@@ -163,40 +163,9 @@ class AirCongestionMap {
         typeof item.lat === 'number' && typeof item.lng === 'number' && item.Airport && item.Airport.trim() !== ''
       );
 
-      const coordinateMap = new Map();
-
-      processedData.forEach(item => {
-        const coordKey = `${item.lat},${item.lng}`;
-        if (!coordinateMap.has(coordKey)) {
-          coordinateMap.set(coordKey, []);
-        }
-        coordinateMap.get(coordKey).push(item);
-      });
-
-      const jitteredData = [];
-      coordinateMap.forEach(itemsAtCoord => {
-        if (itemsAtCoord.length > 1) {
-          const baseLat = itemsAtCoord[0].lat;
-          const baseLng = itemsAtCoord[0].lng;
-
-          const offsetScale = 0.15;
-
-          itemsAtCoord.forEach((item, index) => {
-            const angle = (index / itemsAtCoord.length) * 2 * Math.PI;
-            const jitterLat = baseLat + (Math.cos(angle) * offsetScale * Math.random());
-            const jitterLng = baseLng + (Math.sin(angle) * offsetScale * Math.random());
-
-            item.lat = jitterLat;
-            item.lng = jitterLng;
-            jitteredData.push(item);
-          });
-        } else {
-          jitteredData.push(itemsAtCoord[0]);
-        }
-      });
-
-      this.currentData = jitteredData;
-
+      // Clusters per zoom are computed at publish time; the browser only clusters
+      // when the index is missing or does not match the data
+      this.allMarkers = createClusterGroup(clusters, this.currentData, this.clusterOptions);
       this.renderMarkers();
       this.addRightControls();
 
@@ -234,6 +203,17 @@ class AirCongestionMap {
     });
   }
 
+  createClusterIcon(childCount, level) {
+    const dominantColor = this.getColor(level);
+    const size = 30 + Math.min(childCount * 0.5, 30);
+
+    return new L.DivIcon({
+      html: `<div style="background-color: ${dominantColor}; width: ${size}px; height: ${size}px; line-height: ${size}px; border-radius: 50%; color: white; font-weight: bold; text-align: center; display: flex; align-items: center; justify-content: center;"><span>${childCount}</span></div>`,
+      className: 'marker-cluster-custom',
+      iconSize: new L.Point(size, size)
+    });
+  }
+
   createSingleMarker(item) {
     const level = this.getCongestionLevelByTXO(item.average_txo);
     const color = this.getColor(level);
@@ -412,14 +392,9 @@ class AirCongestionMap {
         this.map.zoomOut();
       });
 
-      const validLocations = this.currentData
+      const locations = facetValues(this.layout, 'location', this.currentData
         .filter(item => item.municipality && item.municipality.trim() !== '' && item.iso_region && item.iso_region.trim() !== '')
-        .map(item => {
-          const regionCode = item.iso_region.split('-').pop();
-          return `${item.municipality}, ${regionCode}`;
-        });
-
-      const locations = [...new Set(validLocations)].sort((a, b) => a.localeCompare(b));
+        .map(item => `${item.municipality}, ${item.iso_region.split('-').pop()}`));
 
       const filterDropdownHtml = `
                     <select class="airport-filter">
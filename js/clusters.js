@@ -0,0 +1,191 @@
+// Draws the per-zoom clusters that scripts/cluster_index.py writes next to a
+// point payload (<name>.clusters.json), so the browser never clusters the
+// markers itself. PrecomputedClusterGroup covers the part of the
+// L.markerClusterGroup API the maps use (addLayer, clearLayers, hasLayer,
+// eachLayer, zoomToShowLayer, options.disableClusteringAtZoom and the
+// 'clusterclick' event whose layer has zoomToBounds()).
+
+// Resolves to the decoded cluster records, or null when the index is missing
+async function loadClusters(url) {
+    try {
+        const response = await fetch(url);
+        return response.ok ? decodePayload(await response.json()) : null;
+    } catch (error) {
+        console.warn(`Cluster index ${url} unavailable:`, error);
+        return null;
+    }
+}
+
+// The index only fits when it clusters exactly the drawn points: every point
+// counted once at the lowest zoom and every single point a drawn record.
+function matchClusters(clusters, points) {
+    if (!clusters || clusters.length === 0) return false;
+    const minZoom = Math.min(...clusters.map(cluster => cluster.zoom));
+    const total = clusters.reduce((sum, cluster) => sum + (cluster.zoom === minZoom ? cluster.count : 0), 0);
+    if (total !== points.length) return false;
+    const drawn = new Set(points.map(point => point.sourceIndex));
+    return clusters.every(cluster => cluster.count !== 1 || drawn.has(cluster.point));
+}
+
+// Falls back to clustering in the browser when the index is missing or stale
+function createClusterGroup(clusters, points, options) {
+    if (matchClusters(clusters, points)) return new PrecomputedClusterGroup(clusters, options);
+    if (clusters) console.warn('Cluster index does not match the data, clustering in the browser.');
+    return L.markerClusterGroup(options);
+}
+
+const ClusterMarker = L.Marker.extend({
+    initialize(cluster, group, options) {
+        L.Marker.prototype.initialize.call(this, [cluster.lat, cluster.lng], options);
+        this._cluster = cluster;
+        this._group = group;
+    },
+
+    getChildCount() {
+        return this._cluster.count;
+    },
+
+    zoomToBounds() {
+        this._group._map.setView(this.getLatLng(), this._group._expansionZoom(this._cluster));
+    }
+});
+
+const PrecomputedClusterGroup = L.Layer.extend({
+    options: {
+        disableClusteringAtZoom: 9,
+        // (count, level) -> L.Icon for a cluster of count points
+        clusterIcon: null
+    },
+
+    initialize(clusters, options) {
+        L.setOptions(this, options);
+        this._byZoom = {};
+        this._children = {};
+        this._singleZoom = {};
+        this._minZoom = Infinity;
+        this._maxZoom = -Infinity;
+        clusters.forEach(cluster => {
+            (this._byZoom[cluster.zoom] = this._byZoom[cluster.zoom] || []).push(cluster);
+            if (cluster.parent !== null && cluster.parent !== undefined) {
+                (this._children[cluster.parent] = this._children[cluster.parent] || []).push(cluster);
+            }
+            if (cluster.count === 1 && !(cluster.zoom >= this._singleZoom[cluster.point])) {
+                this._singleZoom[cluster.point] = cluster.zoom;
+            }
+            this._minZoom = Math.min(this._minZoom, cluster.zoom);
+            this._maxZoom = Math.max(this._maxZoom, cluster.zoom);
+        });
+
+        this._layers = L.layerGroup();
+        this._clusterMarkers = {};
+        this._markers = [];
+        this._byPoint = new Map();
+        this._drawn = new Set();
+    },
+
+    onAdd(map) {
+        this._layers.addTo(map);
+        this._redraw();
+    },
+
+    onRemove() {
+        this._layers.remove();
+        this._drawn.clear();
+    },
+
+    getEvents() {
+        // moveend also follows every zoom
+        return { moveend: this._redraw };
+    },
+
+    addLayer(marker) {
+        this._markers.push(marker);
+        this._byPoint.set(marker.options.itemData.sourceIndex, marker);
+        this._scheduleRedraw();
+        return this;
+    },
+
+    clearLayers() {
+        this._layers.clearLayers();
+        this._drawn.clear();
+        this._markers = [];
+        this._byPoint.clear();
+        return this;
+    },
+
+    hasLayer(marker) {
+        return this._byPoint.get(marker.options.itemData && marker.options.itemData.sourceIndex) === marker;
+    },
+
+    eachLayer(fn, context) {
+        this._markers.forEach(fn, context);
+        return this;
+    },
+
+    // Zooms in until the marker is drawn on its own, then calls back
+    zoomToShowLayer(marker, callback) {
+        const map = this._map;
+        const singleZoom = this._singleZoom[marker.options.itemData.sourceIndex];
+        const zoom = Math.max(map.getZoom(), singleZoom === undefined ? this.options.disableClusteringAtZoom : singleZoom);
+        if (zoom === map.getZoom() && map.getBounds().contains(marker.getLatLng())) {
+            callback();
+            return;
+        }
+        map.once('moveend', () => callback());
+        map.setView(marker.getLatLng(), zoom);
+    },
+
+    // First zoom at which the cluster splits, or where clustering stops
+    _expansionZoom(cluster) {
+        let children = this._children[cluster.id] || [];
+        while (children.length === 1) {
+            children = this._children[children[0].id] || [];
+        }
+        const zoom = children.length > 1 ? children[0].zoom : this.options.disableClusteringAtZoom;
+        return Math.min(zoom, this.options.disableClusteringAtZoom);
+    },
+
+    _clusterMarker(cluster) {
+        let marker = this._clusterMarkers[cluster.id];
+        if (!marker) {
+            marker = new ClusterMarker(cluster, this, { icon: this.options.clusterIcon(cluster.count, cluster.level) });
+            marker.on('click', () => this.fire('clusterclick', { layer: marker }));
+            this._clusterMarkers[cluster.id] = marker;
+        }
+        return marker;
+    },
+
+    _scheduleRedraw() {
+        if (!this._map || this._redrawRequest) return;
+        this._redrawRequest = L.Util.requestAnimFrame(() => {
+            this._redrawRequest = null;
+            this._redraw();
+        });
+    },
+
+    _redraw() {
+        if (!this._map) return;
+        const zoom = this._map.getZoom();
+        const bounds = this._map.getBounds().pad(0.5);
+        const next = new Set();
+        if (zoom >= this.options.disableClusteringAtZoom) {
+            this._markers.forEach(marker => {
+                if (bounds.contains(marker.getLatLng())) next.add(marker);
+            });
+        } else {
+            const level = Math.min(Math.max(Math.floor(zoom), this._minZoom), this._maxZoom);
+            (this._byZoom[level] || []).forEach(cluster => {
+                const layer = cluster.count === 1 ? this._byPoint.get(cluster.point) : this._clusterMarker(cluster);
+                if (layer && bounds.contains(layer.getLatLng())) next.add(layer);
+            });
+        }
+
+        this._drawn.forEach(layer => {
+            if (!next.has(layer)) this._layers.removeLayer(layer);
+        });
+        next.forEach(layer => {
+            if (!this._drawn.has(layer)) this._layers.addLayer(layer);
+        });
+        this._drawn = next;
+    }
+});
@@ -2,7 +2,8 @@ class OceanCongestionMap {
     constructor(mapElementId) {
         this.map = L.map(mapElementId, { zoomControl: false }).setView([37.8, -96], 4);
 
-        this.allMarkers = L.markerClusterGroup({
+        // Shared by the precomputed clusters and the markercluster fallback
+        this.clusterOptions = {
             maxClusterRadius: 40,
             disableClusteringAtZoom: 9,
             spiderfyOnMaxZoom: true,
@@ -10,11 +11,11 @@ class OceanCongestionMap {
             showCoverageOnHover: false,
             showCoverageOnClick: false,
 
+            clusterIcon: (count, level) => this.createClusterIcon(count, level),
             iconCreateFunction: (cluster) => {
                 const childMarkers = cluster.getAllChildMarkers();
                 let highestDelayDays = -1;
                 let dominantLevel = 'Average';
-                let dominantColor = this.getColor(dominantLevel);
 
                 childMarkers.forEach(marker => {
                     const itemData = marker.options.itemData;
@@ -22,21 +23,14 @@ class OceanCongestionMap {
                         if (itemData.current_delay_days > highestDelayDays) {
                             highestDelayDays = itemData.current_delay_days;
                             dominantLevel = this.getCongestionLevelByDelay(itemData.current_delay_days);
-                            dominantColor = this.getColor(dominantLevel);
                         }
                     }
                 });
 
-                const childCount = cluster.getChildCount();
-                const size = 30 + Math.min(childCount * 0.5, 30);
-
-                return new L.DivIcon({
-                    html: `<div style="background-color: ${dominantColor}; width: ${size}px; height: ${size}px; line-height: ${size}px; border-radius: 50%; color: white; font-weight: bold; text-align: center; display: flex; align-items: center; justify-content: center;"><span>${childCount}</span></div>`,
-                    className: 'marker-cluster-custom',
-                    iconSize: new L.Point(size, size)
-                });
+                return this.createClusterIcon(cluster.getChildCount(), dominantLevel);
             }
-        });
+        };
+        this.allMarkers = L.markerClusterGroup(this.clusterOptions);
 
         this.currentData = null;
         this.filterControlInstance = null;
@@ -142,13 +136,19 @@ class OceanCongestionMap {
 
     async loadData() {
         try {
-            const response = await fetch('data/global-ports.json');
+            const [response, layout, clusters] = await Promise.all([
+                fetch('data/global-ports.json'),
+                loadLayout('data/global-ports.layout.json'),
+                loadClusters('data/global-ports.clusters.json')
+            ]);
             if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-            const rawData = await response.json();
+            const rawData = decodePayload(await response.json());
+            // Coincident ports are fanned out and the dropdown is sorted at publish time
+            this.layout = matchLayout(layout, rawData);
 
-            let processedData = rawData.map(item => ({
-                lat: item.lat || item.Latitude,
-                lng: item.lng || item.Longitude,
+            this.currentData = rawData.map((item, index) => ({
+                ...displayPoint(this.layout, index, item.lat || item.Latitude, item.lng || item.Longitude),
+                sourceIndex: index,
                 port: item.port || item.Port,
                 country: item.country || item.Country,
                 port_code: item.port_code,
@@ -162,40 +162,9 @@ class OceanCongestionMap {
                 typeof item.lat === 'number' && typeof item.lng === 'number' && item.port && item.port.trim() !== ''
             );
 
-            const coordinateMap = new Map();
-
-            processedData.forEach(item => {
-                const coordKey = `${item.lat},${item.lng}`;
-                if (!coordinateMap.has(coordKey)) {
-                    coordinateMap.set(coordKey, []);
-                }
-                coordinateMap.get(coordKey).push(item);
-            });
-
-            const jitteredData = [];
-            coordinateMap.forEach(itemsAtCoord => {
-                if (itemsAtCoord.length > 1) {
-                    const baseLat = itemsAtCoord[0].lat;
-                    const baseLng = itemsAtCoord[0].lng;
-
-                    const offsetScale = 0.3;
-
-                    itemsAtCoord.forEach((item, index) => {
-                        const angle = (index / itemsAtCoord.length) * 2 * Math.PI;
-                        const jitterLat = baseLat + (Math.cos(angle) * offsetScale * Math.random());
-                        const jitterLng = baseLng + (Math.sin(angle) * offsetScale * Math.random());
-
-                        item.lat = jitterLat;
-                        item.lng = jitterLng;
-                        jitteredData.push(item);
-                    });
-                } else {
-                    jitteredData.push(itemsAtCoord[0]);
-                }
-            });
-
-            this.currentData = jitteredData;
-
+            // Clusters per zoom are computed at publish time; the browser only clusters
+            // when the index is missing or does not match the data
+            this.allMarkers = createClusterGroup(clusters, this.currentData, this.clusterOptions);
             this.renderMarkers();
             this.addRightControls();
 
@@ -233,6 +202,17 @@ class OceanCongestionMap {
         });
     }
 
+    createClusterIcon(childCount, level) {
+        const dominantColor = this.getColor(level);
+        const size = 30 + Math.min(childCount * 0.5, 30);
+
+        return new L.DivIcon({
+            html: `<div style="background-color: ${dominantColor}; width: ${size}px; height: ${size}px; line-height: ${size}px; border-radius: 50%; color: white; font-weight: bold; text-align: center; display: flex; align-items: center; justify-content: center;"><span>${childCount}</span></div>`,
+            className: 'marker-cluster-custom',
+            iconSize: new L.Point(size, size)
+        });
+    }
+
     createSingleMarker(item) {
         const level = this.getCongestionLevelByDelay(item.current_delay_days);
         const color = this.getColor(level);
@@ -412,10 +392,7 @@ class OceanCongestionMap {
                 <button class="ocean-reset-btn reset-btn">Reset View</button>
             `);
 
-            const allCountries = [...new Set(this.currentData
-                .map(item => item.country)
-                .filter(c => c && c.trim() !== '')
-            )].sort((a, b) => a.localeCompare(b));
+            const allCountries = facetValues(this.layout, 'country', this.currentData.map(item => item.country));
 
             const countryFilterHtml = `
                 <select class="country-filter">
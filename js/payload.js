@@ -0,0 +1,56 @@
+// Turns any layout written by scripts/output_format.py back into plain records:
+// pretty/compact JSON is returned as-is, the "columns" layout is expanded
+// (dictionary-encoded fields decoded, keyed payloads rebuilt as an object).
+function decodePayload(raw) {
+    if (!raw || raw.format !== 'columns') return raw;
+
+    const fields = Object.keys(raw.columns);
+    const dictionaries = raw.dictionaries || {};
+    const records = new Array(raw.count);
+    for (let i = 0; i < raw.count; i++) {
+        const record = {};
+        fields.forEach(field => {
+            const value = raw.columns[field][i];
+            const dictionary = dictionaries[field];
+            record[field] = dictionary ? dictionary[value] : value;
+        });
+        records[i] = record;
+    }
+
+    if (!raw.key) return records;
+    const keyed = {};
+    records.forEach(record => {
+        const { [raw.key]: key, ...rest } = record;
+        keyed[key] = rest;
+    });
+    return keyed;
+}
+
+// Loads the <name>.layout.json that scripts/map_layout.py writes next to a
+// point payload. Resolves to null when it is missing or does not match the
+// records (count differs), and the maps then fall back to plain positions.
+async function loadLayout(url) {
+    try {
+        const response = await fetch(url);
+        return response.ok ? await response.json() : null;
+    } catch (error) {
+        console.warn(`Layout ${url} unavailable:`, error);
+        return null;
+    }
+}
+
+function matchLayout(layout, records) {
+    return layout && layout.count === records.length ? layout : null;
+}
+
+// Where record `index` is drawn: fanned out if it shares its position, else where it is
+function displayPoint(layout, index, lat, lng) {
+    const point = layout && layout.display[index];
+    return point ? { lat: point[0], lng: point[1] } : { lat, lng };
+}
+
+// Sorted dropdown values of a facet; only computed here when there is no layout
+function facetValues(layout, facet, values) {
+    if (layout && layout.facets[facet]) return layout.facets[facet].map(([value]) => value);
+    return [...new Set(values.filter(value => value && value.trim() !== ''))].sort((a, b) => a.localeCompare(b));
+}
@@ -2,7 +2,8 @@ class RailCongestionMap {
     constructor(mapElementId) {
         this.map = L.map(mapElementId, { zoomControl: false }).setView([37.8, -96], 4);
 
-        this.allMarkers = L.markerClusterGroup({
+        // Shared by the precomputed clusters and the markercluster fallback
+        this.clusterOptions = {
             maxClusterRadius: 40,
             disableClusteringAtZoom: 9,
             spiderfyOnMaxZoom: true,
@@ -10,10 +11,11 @@ class RailCongestionMap {
             showCoverageOnHover: false,
             showCoverageOnClick: false,
 
+            clusterIcon: (count, level) => this.createClusterIcon(count, level),
             iconCreateFunction: (cluster) => {
                 const childMarkers = cluster.getAllChildMarkers();
                 let highestCongestionLevelValue = -1;
-                let dominantColor = this.getColor('Average');
+                let dominantLevel = 'Average';
 
                 const congestionLevelToValue = (level) => {
                     switch (level) {
@@ -32,21 +34,15 @@ class RailCongestionMap {
                         const currentLevelValue = congestionLevelToValue(itemData.congestion_level);
                         if (currentLevelValue > highestCongestionLevelValue) {
                             highestCongestionLevelValue = currentLevelValue;
-                            dominantColor = this.getColor(itemData.congestion_level);
+                            dominantLevel = itemData.congestion_level;
                         }
                     }
                 });
 
-                const childCount = cluster.getChildCount();
-                const size = 30 + Math.min(childCount * 0.5, 30);
-
-                return new L.DivIcon({
-                    html: `<div style="background-color: ${dominantColor}; width: ${size}px; height: ${size}px; line-height: ${size}px; border-radius: 50%; color: white; font-weight: bold; text-align: center; display: flex; align-items: center; justify-content: center;"><span>${childCount}</span></div>`,
-                    className: 'marker-cluster-custom',
-                    iconSize: new L.Point(size, size)
-                });
+                return this.createClusterIcon(cluster.getChildCount(), dominantLevel);
             }
-        });
+        };
+        this.allMarkers = L.markerClusterGroup(this.clusterOptions);
 
         this.currentData = null;
         this.filterControlInstance = null;
@@ -152,13 +148,19 @@ class RailCongestionMap {
 
     async loadData() {
         try {
-            const response = await fetch('data/us-rail.json');
+            const [response, layout, clusters] = await Promise.all([
+                fetch('data/us-rail.json'),
+                loadLayout('data/us-rail.layout.json'),
+                loadClusters('data/us-rail.clusters.json')
+            ]);
             if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-            const rawData = await response.json();
+            const rawData = decodePayload(await response.json());
+            // Coincident yards are fanned out and the dropdown is sorted at publish time
+            this.layout = matchLayout(layout, rawData);
 
-            let processedData = rawData.map(item => ({
-                lat: item.lat,
-                lng: item.lng,
+            this.currentData = rawData.map((item, index) => ({
+                ...displayPoint(this.layout, index, item.lat, item.lng),
+                sourceIndex: index,
                 Yard: item.location,
                 location: item.location,
                 company: item.company,
@@ -171,40 +173,9 @@ class RailCongestionMap {
                 item.lat !== undefined && item.lng !== undefined && item.location && item.congestion_level
             );
 
-            const coordinateMap = new Map();
-
-            processedData.forEach(item => {
-                const coordKey = `${item.lat},${item.lng}`;
-                if (!coordinateMap.has(coordKey)) {
-                    coordinateMap.set(coordKey, []);
-                }
-                coordinateMap.get(coordKey).push(item);
-            });
-
-            const jitteredData = [];
-            coordinateMap.forEach(itemsAtCoord => {
-                if (itemsAtCoord.length > 1) {
-                    const baseLat = itemsAtCoord[0].lat;
-                    const baseLng = itemsAtCoord[0].lng;
-
-                    const offsetScale = 0.15;
-
-                    itemsAtCoord.forEach((item, index) => {
-                        const angle = (index / itemsAtCoord.length) * 2 * Math.PI;
-                        const jitterLat = baseLat + (Math.cos(angle) * offsetScale * Math.random());
-                        const jitterLng = baseLng + (Math.sin(angle) * offsetScale * Math.random());
-
-                        item.lat = jitterLat;
-                        item.lng = jitterLng;
-                        jitteredData.push(item);
-                    });
-                } else {
-                    jitteredData.push(itemsAtCoord[0]);
-                }
-            });
-
-            this.currentData = jitteredData;
-
+            // Clusters per zoom are computed at publish time; the browser only clusters
+            // when the index is missing or does not match the data
+            this.allMarkers = createClusterGroup(clusters, this.currentData, this.clusterOptions);
             this.renderMarkers();
             this.addRightControls();
 
@@ -242,6 +213,17 @@ class RailCongestionMap {
         });
     }
 
+    createClusterIcon(childCount, level) {
+        const dominantColor = this.getColor(level);
+        const size = 30 + Math.min(childCount * 0.5, 30);
+
+        return new L.DivIcon({
+            html: `<div style="background-color: ${dominantColor}; width: ${size}px; height: ${size}px; line-height: ${size}px; border-radius: 50%; color: white; font-weight: bold; text-align: center; display: flex; align-items: center; justify-content: center;"><span>${childCount}</span></div>`,
+            className: 'marker-cluster-custom',
+            iconSize: new L.Point(size, size)
+        });
+    }
+
     createSingleMarker(item) {
         const level = item.congestion_level || 'Average';
         const color = this.getColor(level);
@@ -413,11 +395,7 @@ class RailCongestionMap {
                 this.map.zoomOut();
             });
 
-            const validYards = this.currentData
-                .filter(item => item.Yard && item.Yard.trim() !== '')
-                .map(item => item.Yard);
-
-            const yards = [...new Set(validYards)].sort((a, b) => a.localeCompare(b));
+            const yards = facetValues(this.layout, 'Yard', this.currentData.map(item => item.Yard));
 
             const filterDropdownHtml = `
                 <select class="yard-filter">
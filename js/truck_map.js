@@ -45,13 +45,7 @@ class TruckCongestionMap {
 
     async init() {
         try {
-            const [geoJson, sheetData] = await Promise.all([
-                fetch('data/us-states.json').then(res => {
-                    if (!res.ok) throw new Error("GeoJSON fetch error");
-                    return res.json();
-                }),
-                this.fetchSheetData()
-            ]);
+            const [geoJson, sheetData] = await this.loadStates();
 
             this.geoJsonData = geoJson;
             this.metricData = sheetData;
@@ -65,11 +59,35 @@ class TruckCongestionMap {
         }
     }
 
+    async loadStates() {
+        // One request: simplified state shapes with the truck metrics already joined in
+        try {
+            const res = await fetch('data/us-truck.topo.json');
+            if (!res.ok) throw new Error("Topology fetch error");
+            const topology = await res.json();
+            const geoJson = topojson.feature(topology, topology.objects.states);
+            const sheetData = {};
+            geoJson.features.forEach(feature => {
+                if (feature.properties.metrics) sheetData[feature.id] = feature.properties.metrics;
+            });
+            return [geoJson, sheetData];
+        } catch (err) {
+            console.warn("Truck topology unavailable, loading GeoJSON and metrics separately.", err);
+            return Promise.all([
+                fetch('data/us-states.json').then(res => {
+                    if (!res.ok) throw new Error("GeoJSON fetch error");
+                    return res.json();
+                }),
+                this.fetchSheetData()
+            ]);
+        }
+    }
+
     async fetchSheetData() {
         try {
             const res = await fetch('data/us-truck.json');
             if (!res.ok) throw new Error("Truck data fetch error");
-            return await res.json();
+            return decodePayload(await res.json());
         } catch (err) {
             console.warn("Truck data fetch failed, using fallback data.");
             return {
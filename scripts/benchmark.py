@@ -0,0 +1,193 @@
+# scripts/benchmark.py
+# Benchmarks the fetchers against the offline fake_sheets backend.
+#
+#   python scripts/benchmark.py --rows 1000,100000 --save-baseline benchmarks/baseline.json
+#   python scripts/benchmark.py --rows 1000,100000 --compare benchmarks/baseline.json
+#
+# For every mode and row count it reports the best-of-N time of each stage
+# (read: the first pages through SheetReader.prefetch_pages, then every row
+# through SheetReader.rows(), paging like a real run; transform: sheet values ->
+# records; total: prefetch_pages plus the fetcher on a fresh reader, end to
+# end; publish: what total spends beyond read and transform, i.e. fingerprints,
+# spooling and every output file), end-to-end throughput and peak Python
+# memory. --page-rows shrinks the pages so even small sheets take the paged,
+# next-page-overlapped path. Outputs go to a throwaway FETCH_DATA_DIR, never to
+# data/. --compare exits non-zero if a stage got slower (or peak memory grew)
+# by more than --tolerance against the saved baseline.
+# The Sheets read quota is not applied unless --quota is given; --error-rate
+# makes the fake API fail that share of calls, to measure the cost of retries.
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from fake_sheets import FakeSpreadsheet, generate_workbook
+from sheet_access import SheetReader
+from request_scheduler import RequestScheduler
+from fetch_truck_data import fetch_truck_data, transform_truck, TRUCK_RANGE, TRUCK_RANGES
+from fetch_rail_data import fetch_rail_data, transform_rail, RAIL_RANGES, RAIL_SOURCES
+from fetch_ocean_data import fetch_ocean_data, transform_ocean, OCEAN_RANGE, OCEAN_RANGES
+from fetch_air_data import fetch_air_data, transform_air, AIR_RANGE, AIR_RANGES
+
+# mode -> (fetcher, ranges, transform over {range: values})
+BENCHMARKS = {
+    'truck': (fetch_truck_data, TRUCK_RANGES, lambda values: transform_truck(values[TRUCK_RANGE])),
+    'rail': (fetch_rail_data, RAIL_RANGES, lambda values: transform_rail(
+        {source: values[rng] for source, rng, *_ in RAIL_SOURCES})),
+    'ocean': (fetch_ocean_data, OCEAN_RANGES, lambda values: transform_ocean(values[OCEAN_RANGE])),
+    'air': (fetch_air_data, AIR_RANGES, lambda values: transform_air(values[AIR_RANGE])),
+}
+
+STAGES = ('read', 'transform', 'publish', 'total')
+# Differences below this are noise, whatever the ratio
+NOISE_FLOOR_SECONDS = 0.005
+
+@contextlib.contextmanager
+def isolated_data_dir():
+    # Fresh outputs, fingerprints and history for every run
+    saved = {key: os.environ.get(key) for key in ('FETCH_DATA_DIR', 'FETCH_STATE_PATH', 'HISTORY_PATH')}
+    with tempfile.TemporaryDirectory(prefix='fetch-bench-') as directory:
+        os.environ['FETCH_DATA_DIR'] = directory
+        os.environ.pop('FETCH_STATE_PATH', None)
+        os.environ.pop('HISTORY_PATH', None)
+        try:
+            yield directory
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+def new_reader(sheet, quota=0, page_rows=None):
+    return SheetReader(sheet, rows_per_page=page_rows, scheduler=RequestScheduler(quota_per_minute=quota))
+
+def run_once(mode, sheet, quota=0, page_rows=None):
+    fetcher, ranges, transform = BENCHMARKS[mode]
+    timings = {}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        # The same read path as a run: first pages in one request, the rest
+        # streamed by rows() with the next page fetched in the background
+        reader = new_reader(sheet, quota, page_rows)
+        start = time.perf_counter()
+        reader.prefetch_pages(ranges)
+        values = {rng: list(reader.rows(rng)) for rng in ranges}
+        timings['read'] = time.perf_counter() - start
+        # Rows actually read, header excluded
+        timings['rows_read'] = sum(max(len(rows) - 1, 0) for rows in values.values())
+
+        start = time.perf_counter()
+        transform(values)
+        timings['transform'] = time.perf_counter() - start
+        del values
+
+        # End to end on a fresh reader, so the fetcher pages, fingerprints and
+        # spools the worksheets itself
+        reader = new_reader(sheet, quota, page_rows)
+        with isolated_data_dir():
+            start = time.perf_counter()
+            reader.prefetch_pages(ranges)
+            ok = fetcher(reader)
+            timings['total'] = time.perf_counter() - start
+    if not ok:
+        raise RuntimeError(f"fetch_{mode}_data reported failure")
+    timings['publish'] = max(timings['total'] - timings['read'] - timings['transform'], 0.0)
+    return timings
+
+def peak_memory(mode, sheet, quota=0, page_rows=None):
+    tracemalloc.start()
+    try:
+        run_once(mode, sheet, quota, page_rows)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def benchmark(modes, row_counts, repeat=3, latency=0.0, duplicate_ratio=0.1,
+              missing_coordinate_rate=0.02, measure_memory=True, quota=0, error_rate=0.0, page_rows=None):
+    results = {}
+    for rows in row_counts:
+        start = time.perf_counter()
+        sheet = FakeSpreadsheet(generate_workbook(rows, duplicate_ratio, missing_coordinate_rate), latency,
+                                error_rate=error_rate)
+        print(f"🔵 {rows:,} rows per worksheet (generated in {time.perf_counter() - start:.1f}s)")
+        for mode in modes:
+            runs = [run_once(mode, sheet, quota, page_rows) for _ in range(repeat)]
+            best = {stage: min(run[stage] for run in runs) for stage in STAGES}
+            rows_read = runs[0]['rows_read']
+            result = {'rows': rows_read, **best, 'rows_per_second': rows_read / best['total'] if best['total'] else None}
+            if measure_memory:
+                result['peak_bytes'] = peak_memory(mode, sheet, quota, page_rows)
+            results[f"{mode}@{rows}"] = result
+            print_result(mode, result)
+    return results
+
+def print_result(mode, result):
+    stages = '  '.join(f"{stage} {result[stage] * 1000:8.1f}ms" for stage in STAGES)
+    memory = f"  peak {result['peak_bytes'] / 2**20:7.1f} MiB" if 'peak_bytes' in result else ''
+    print(f"  {mode:<6} {result['rows']:>9,} rows  {stages}  {result['rows_per_second'] or 0:>10,.0f} rows/s{memory}")
+
+def compare(results, baseline, tolerance):
+    # Returns the list of regressions against the baseline
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            print(f"⚠️ {key}: no baseline")
+            continue
+        for metric in STAGES + ('peak_bytes',):
+            if metric not in result or metric not in previous:
+                continue
+            old, new = previous[metric], result[metric]
+            floor = NOISE_FLOOR_SECONDS if metric != 'peak_bytes' else 0
+            if new > old * (1 + tolerance) and new - old > floor:
+                regressions.append(f"{key} {metric}: {old:.4g} -> {new:.4g} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the fetchers against synthetic worksheets.")
+    parser.add_argument('--modes', default=','.join(BENCHMARKS), help="comma-separated modes (default: all)")
+    parser.add_argument('--rows', default='100,1000,10000', help="comma-separated body rows per worksheet")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per measurement; the best one counts")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every fake API call")
+    parser.add_argument('--duplicates', type=float, default=0.1, help="share of duplicate rail/ocean entities")
+    parser.add_argument('--missing', type=float, default=0.02, help="share of rows with a blank latitude")
+    parser.add_argument('--quota', type=float, default=0, help="Sheets read requests per minute (default: no limit)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of fake API calls failing with 429/5xx")
+    parser.add_argument('--page-rows', type=int, help="rows per page read (default: SHEET_PAGE_ROWS or the reader's)")
+    parser.add_argument('--no-memory', action='store_true', help="skip the (slower) peak memory run")
+    parser.add_argument('--save-baseline', metavar='PATH', help="write the results as the new baseline")
+    parser.add_argument('--compare', metavar='PATH', help="compare with a saved baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown before failing --compare")
+    args = parser.parse_args(argv)
+
+    modes = [mode for mode in args.modes.split(',') if mode]
+    unknown = [mode for mode in modes if mode not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+
+    results = benchmark(modes, [int(rows) for rows in args.rows.split(',')], args.repeat, args.latency,
+                        args.duplicates, args.missing, not args.no_memory, args.quota, args.error_rate,
+                        args.page_rows)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"✅ Baseline saved to: {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("❌ Regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("✅ No regressions against the baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# scripts/change_detection.py
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from output_format import data_dir, output_signature
+from tiling import tile_zoom
+
+STATE_FILENAME = '.fingerprints.json'
+# Spooled rows move from memory to a temporary file past this size
+SPOOL_MEMORY_BYTES = 8 << 20
+
+def fingerprint_seed(transform_version):
+    return hashlib.sha256(f"v{transform_version}\n{output_signature()}\ntiles={tile_zoom()}\n".encode('utf-8'))
+
+class RowFingerprint:
+    # Content hash of a worksheet's raw rows plus the version of the code that
+    # transforms them and the output layout, so changing any of them counts as
+    # "changed". consume() hashes a row stream and spools it to a temporary file
+    # (in memory while small); replay() streams the spooled rows back for the
+    # transform, so a changed worksheet is never fetched twice or held whole,
+    # and an unchanged one is never transformed.
+    def __init__(self, transform_version):
+        self._digest = fingerprint_seed(transform_version)
+        self._spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+        self.rows = 0
+
+    def consume(self, rows):
+        for row in rows:
+            line = json.dumps(row, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            self._digest.update(b',' if self.rows else b'[')
+            self._digest.update(line)
+            self._spool.write(line + b'\n')
+            self.rows += 1
+        return self
+
+    def replay(self):
+        self._spool.seek(0)
+        for line in self._spool:
+            yield json.loads(line)
+        self._spool.close()
+
+    def hexdigest(self):
+        digest = self._digest.copy()
+        digest.update(b']' if self.rows else b'[]')
+        return digest.hexdigest()
+
+class FingerprintStore:
+    # Persisted fingerprint per worksheet range, shared by every fetcher in a run.
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('FETCH_STATE_PATH') or os.path.join(data_dir(), STATE_FILENAME)
+        self.changed = {}
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self._fingerprints = json.load(f)
+        except (OSError, ValueError):
+            self._fingerprints = {}
+
+    def is_unchanged(self, mode, fingerprints, output_path):
+        # Unchanged only if every range matches and the last output is still on disk.
+        with self._lock:
+            unchanged = os.path.exists(output_path) and all(
+                self._fingerprints.get(rng) == fp for rng, fp in fingerprints.items()
+            )
+            if unchanged:
+                self.changed[mode] = False
+            return unchanged
+
+    def commit(self, mode, fingerprints):
+        # Call only after the output has been written successfully.
+        with self._lock:
+            self._fingerprints.update(fingerprints)
+            self.changed[mode] = True
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._fingerprints, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,228 @@
+# scripts/cluster_index.py
+# Precomputed marker clusters for the point maps (rail, ocean, air).
+# Supercluster-style: points are projected to web mercator and greedily merged
+# within CLUSTER_RADIUS pixels, one zoom at a time from MAX_ZOOM down to MIN_ZOOM,
+# each zoom clustering the clusters of the zoom above. Every cluster carries its
+# point count and worst congestion level, so the front end can draw a zoom level
+# straight from <output>.clusters.json without clustering in the browser.
+#
+# Record fields: zoom, id, parent (id of the enclosing cluster one zoom out),
+# lat, lng, count, level, point (index into the source file for single points).
+import math
+import os
+import sys
+from collections import defaultdict, namedtuple
+from output_format import data_dir, read_output, write_output
+from metrics import for_mode, stage
+
+# Same settings as the L.markerClusterGroup in js/*_map.js
+CLUSTER_RADIUS = 40
+TILE_EXTENT = 256
+MIN_ZOOM = 3
+MAX_ZOOM = 8  # clustering is disabled from zoom 9 (disableClusteringAtZoom)
+
+LEVEL_RANK = {'Very Low': 0, 'Low': 1, 'Average': 2, 'High': 3, 'Very High': 4}
+LEVELS = sorted(LEVEL_RANK, key=LEVEL_RANK.get)
+
+# source file, record -> (lat, lng, severity) or None, severity -> level
+ClusterSource = namedtuple('ClusterSource', ['filename', 'point', 'level'])
+
+def is_number(val):
+    return isinstance(val, (int, float)) and not isinstance(val, bool)
+
+# The point filters and level thresholds mirror loadData() and the
+# getCongestionLevelBy*() helpers of each map.
+def rail_point(record):
+    level = record.get('congestion_level')
+    if record.get('lat') is None or record.get('lng') is None or not record.get('location') or not level:
+        return None
+    return record['lat'], record['lng'], LEVEL_RANK.get(level)
+
+def rail_level(rank):
+    return LEVELS[rank]
+
+def ocean_point(record):
+    lat = record.get('lat') or record.get('Latitude')
+    lng = record.get('lng') or record.get('Longitude')
+    port = record.get('port') or record.get('Port')
+    if not is_number(lat) or not is_number(lng) or not port or not str(port).strip():
+        return None
+    delay = record.get('current_delay_days')
+    return lat, lng, delay if is_number(delay) else None
+
+def ocean_level(delay_days):
+    if delay_days >= 10:
+        return 'Very High'
+    if delay_days >= 6:
+        return 'High'
+    if delay_days >= 3:
+        return 'Average'
+    if delay_days >= 1:
+        return 'Low'
+    if delay_days == 0:
+        return 'Very Low'
+    return 'Unknown'
+
+def air_point(record):
+    lat, lng = record.get('latitude_deg'), record.get('longitude_deg')
+    code = record.get('airport_code')
+    if not is_number(lat) or not is_number(lng) or not code or not str(code).strip():
+        return None
+    txo = record.get('average_txo')
+    return lat, lng, txo if is_number(txo) else None
+
+def air_level(txo):
+    if txo >= 25:
+        return 'Very High'
+    if txo >= 20:
+        return 'High'
+    if txo >= 15:
+        return 'Average'
+    if txo >= 10:
+        return 'Low'
+    return 'Very Low'
+
+CLUSTER_SOURCES = {
+    'rail': ClusterSource('us-rail.json', rail_point, rail_level),
+    'ocean': ClusterSource('global-ports.json', ocean_point, ocean_level),
+    'air': ClusterSource('us-air.json', air_point, air_level),
+}
+
+def project(lat, lng):
+    # Web mercator, both axes in [0, 1]
+    sin = math.sin(math.radians(max(-85.05112878, min(85.05112878, lat))))
+    y = 0.5 - 0.25 * math.log((1 + sin) / (1 - sin)) / math.pi
+    return lng / 360 + 0.5, min(1.0, max(0.0, y))
+
+def unproject(x, y):
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lat, (x - 0.5) * 360
+
+class Node:
+    __slots__ = ('x', 'y', 'count', 'severity', 'point', 'id', 'parent')
+
+    def __init__(self, x, y, count, severity, point=None):
+        self.x, self.y = x, y
+        self.count = count
+        self.severity = severity
+        self.point = point
+        self.id = None
+        self.parent = None
+
+def merge_severity(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+def cluster_zoom(nodes, zoom, radius):
+    # One greedy pass: each unclaimed node absorbs the unclaimed nodes within radius.
+    r = radius / (TILE_EXTENT * 2 ** zoom)
+    grid = defaultdict(list)
+    for i, node in enumerate(nodes):
+        grid[(int(node.x // r), int(node.y // r))].append(i)
+
+    taken = [False] * len(nodes)
+    clusters = []
+    for i, node in enumerate(nodes):
+        if taken[i]:
+            continue
+        taken[i] = True
+        members = [node]
+        cx, cy = int(node.x // r), int(node.y // r)
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for j in grid.get((gx, gy), ()):
+                    other = nodes[j]
+                    if not taken[j] and (other.x - node.x) ** 2 + (other.y - node.y) ** 2 <= r * r:
+                        taken[j] = True
+                        members.append(other)
+
+        if len(members) == 1:
+            cluster = Node(node.x, node.y, node.count, node.severity, node.point)
+        else:
+            count = sum(m.count for m in members)
+            severity = None
+            for m in members:
+                severity = merge_severity(severity, m.severity)
+            cluster = Node(sum(m.x * m.count for m in members) / count,
+                           sum(m.y * m.count for m in members) / count,
+                           count, severity)
+        clusters.append((cluster, members))
+    return clusters
+
+def build_clusters(points, level, radius=CLUSTER_RADIUS, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+    # points: (lat, lng, severity) per source record, None for records the map skips
+    nodes = []
+    for i, p in enumerate(points):
+        if p is not None:
+            lat, lng, severity = p
+            nodes.append(Node(*project(lat, lng), 1, severity, point=i))
+
+    zooms = {}
+    next_id = 0
+    for zoom in range(max_zoom, min_zoom - 1, -1):
+        clusters = cluster_zoom(nodes, zoom, radius)
+        for cluster, members in clusters:
+            cluster.id = next_id
+            next_id += 1
+            for member in members:
+                member.parent = cluster.id
+        nodes = [cluster for cluster, _ in clusters]
+        zooms[zoom] = nodes
+
+    records = []
+    for zoom in range(min_zoom, max_zoom + 1):
+        for node in zooms[zoom]:
+            lat, lng = unproject(node.x, node.y)
+            if node.severity is not None:
+                node_level = level(node.severity)
+            else:
+                # Same fallback as the markers ('Unknown') and iconCreateFunction ('Average')
+                node_level = 'Unknown' if node.count == 1 else 'Average'
+            records.append({
+                'zoom': zoom,
+                'id': node.id,
+                'parent': node.parent,
+                'lat': round(lat, 5),
+                'lng': round(lng, 5),
+                'count': node.count,
+                'level': node_level,
+                'point': node.point,
+            })
+    return records
+
+def cluster_index_path(source_path):
+    root, ext = os.path.splitext(source_path)
+    return f"{root}.clusters{ext}"
+
+def build_cluster_indexes(modes=None, changed=None, output_dir=None):
+    # Rebuilds the index of every mode whose output changed (all modes when
+    # changed is None) or whose index is missing. Returns mode -> success.
+    results = {}
+    for mode in CLUSTER_SOURCES if modes is None else modes:
+        source = CLUSTER_SOURCES.get(mode)
+        if source is None:
+            continue
+        source_path = os.path.join(output_dir or data_dir(), source.filename)
+        index_path = cluster_index_path(source_path)
+        if changed is not None and not changed.get(mode) and os.path.exists(index_path):
+            print(f"⏭️ {mode} unchanged, keeping {os.path.basename(index_path)}")
+            results[mode] = True
+            continue
+
+        try:
+            with for_mode(mode), stage('cluster_index'):
+                records = read_output(source_path)
+                clusters = build_clusters([source.point(record) for record in records], source.level)
+                write_output(index_path, clusters, dictionary=('level',))
+            print(f"✅ {mode} cluster index: {len(clusters)} clusters over zooms {MIN_ZOOM}-{MAX_ZOOM}")
+            results[mode] = True
+        except Exception as e:
+            print(f"❌ Error building {mode} cluster index: {str(e)}")
+            results[mode] = False
+    return results
+
+if __name__ == "__main__":
+    sys.exit(0 if all(build_cluster_indexes(sys.argv[1:] or None).values()) else 1)
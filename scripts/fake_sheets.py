@@ -0,0 +1,226 @@
+# scripts/fake_sheets.py
+# Offline stand-in for the gspread spreadsheet: serves synthetic CONGESTION_*
+# worksheets through the same values_batch_get call SheetReader uses, so the
+# fetchers can run and be benchmarked without GOOGLE_CREDENTIAL_JSON.
+#
+#   sheet = FakeSpreadsheet(generate_workbook(rows=100000, duplicate_ratio=0.2), latency=0.3)
+#   fetch_all_data(sheet=sheet)
+#
+# quota_per_minute and error_rate make it answer like a busy API: 429 once
+# more than the quota has been read in the last minute, and random 429/5xx
+# responses, for exercising request_scheduler.
+import random
+import re
+import threading
+import time
+from collections import deque, namedtuple
+from sheet_access import column_index, trim_row
+
+STATE_CODES = [
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA', 'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY',
+    'LA', 'ME', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC', 'ND',
+    'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY',
+]
+
+# (name, lat, lng) hubs that synthetic yards and airports are scattered around
+HUBS = [
+    ('Chicago', 41.88, -87.63), ('St. Louis', 38.63, -90.20), ('Kansas City', 39.10, -94.58),
+    ('Houston', 29.76, -95.37), ('Memphis', 35.15, -90.05), ('Atlanta', 33.75, -84.39),
+    ('Dallas', 32.78, -96.80), ('Denver', 39.74, -104.99), ('Los Angeles', 34.05, -118.24),
+    ('Seattle', 47.61, -122.33), ('Minneapolis', 44.98, -93.27), ('New Orleans', 29.95, -90.07),
+    ('Jacksonville', 30.33, -81.66), ('Pittsburgh', 40.44, -79.99), ('Omaha', 41.26, -95.93),
+]
+
+RAIL_COMPANIES = ['BNSF', 'UP', 'CSX', 'NS', 'CN', 'CPKC']
+RAIL2_COMPANIES = ['CPKC', 'CP', 'KCS', 'CN', 'BNSF', 'UP', 'Cpkc', ' KCS ', 'cp']
+CATEGORIES = ['Very Low', 'Low', 'Average', 'High', 'Very High']
+COUNTRIES = [('China', 'CN'), ('United States', 'US'), ('Singapore', 'SG'), ('Netherlands', 'NL'),
+             ('Germany', 'DE'), ('Korea', 'KR'), ('Brazil', 'BR'), ('India', 'IN')]
+
+HEADERS = {
+    'CONGESTION_TRUCK': ['Code', 'State', 'Inbound Delay', 'Inbound Color', 'Outbound Delay', 'Outbound Color',
+                         'Dwell Inbound', 'Dwell Outbound'],
+    'CONGESTION_RAIL': ['Date', 'Railroad', 'Location', 'Latitude', 'Longitude', 'Dwell Time', 'Average',
+                        'Indicator', 'Category'],
+    'CONGESTION_RAIL2': ['Date of Rightmost Value', 'Railroad Company', 'Location', 'Latitude', 'Longitude',
+                         'Rightmost Dwell Time'],
+    'CONGESTION_OCEAN': ['Date', 'Port', 'Country', 'Country Code', 'Port Code', 'Current Delay (days)',
+                         'Current Delay', 'Delay Level', 'Latitude', 'Longitude', 'Weekly Median Delay',
+                         'Weekly Max Delay', 'Fortnightly Median Delay', 'Fortnightly Max Delay',
+                         'Monthly Median Delay', 'Monthly Max Delay'],
+    'CONGESTION_AIR': ['Code', 'Scheduled', 'Completed', 'Departed', 'Cancelled', 'Completion Factor', 'D15',
+                       'A14', 'D0 Percent', 'Average TXO', 'Last Updated', 'latitude_deg', 'longitude_deg',
+                       'iso_region', 'municipality'],
+}
+
+class WorkbookGenerator:
+    # rows: body rows per worksheet
+    # duplicate_ratio: share of rail/ocean rows that repeat an earlier entity
+    # missing_coordinate_rate: share of rows with a blank latitude
+    def __init__(self, rows=1000, duplicate_ratio=0.1, missing_coordinate_rate=0.02, seed=0):
+        self.rows = rows
+        self.duplicate_ratio = duplicate_ratio
+        self.missing_coordinate_rate = missing_coordinate_rate
+        self.random = random.Random(seed)
+
+    def coordinate(self, value, spread):
+        if self.random.random() < self.missing_coordinate_rate:
+            return ''
+        return f"{value + self.random.uniform(-spread, spread):.5f}"
+
+    def number(self, low, high, digits=1):
+        return f"{self.random.uniform(low, high):.{digits}f}"
+
+    def truck(self):
+        rows = []
+        for i in range(self.rows):
+            code = STATE_CODES[i] if i < len(STATE_CODES) else f"S{i}"
+            rows.append([code, f"State {code}", self.number(-5, 5, 2), str(self.random.randint(-5, 5)),
+                         f"{self.random.randint(0, 5000):,}", str(self.random.randint(-3, 3)),
+                         self.number(0, 50), self.number(0, 50)])
+        return rows
+
+    def yard(self, i, companies):
+        if i and self.random.random() < self.duplicate_ratio:
+            return None
+        name, lat, lng = self.random.choice(HUBS)
+        return (self.random.choice(companies), f"{name} Yard {self.random.randint(0, max(1, self.rows // 20))}",
+                lat + self.random.uniform(-1, 1), lng + self.random.uniform(-1, 1))
+
+    def rail(self, shared):
+        rows = []
+        for i in range(self.rows):
+            key = self.yard(i, RAIL_COMPANIES) or self.random.choice(shared)
+            shared.append(key)
+            company, location, lat, lng = key
+            rows.append(['2025-01-06', company, location, self.coordinate(lat, 0), f"{lng:.5f}",
+                         self.number(10, 40), self.number(10, 40), self.number(-3, 3, 2),
+                         self.random.choice(CATEGORIES)])
+        return rows
+
+    def rail2(self, shared):
+        rows = []
+        for i in range(self.rows):
+            key = self.yard(i, RAIL2_COMPANIES) or self.random.choice(shared)
+            company, location, lat, lng = key
+            dwell = self.random.choice([self.number(5, 35), self.number(5, 35), 'N/A'])
+            rows.append(['2025-01-07', company, location, self.coordinate(lat, 0), f"{lng:.5f}", dwell])
+        return rows
+
+    def ocean(self):
+        rows = []
+        for i in range(self.rows):
+            port = i
+            if i and self.random.random() < self.duplicate_ratio:
+                port = self.random.randrange(i)
+            country, country_code = COUNTRIES[port % len(COUNTRIES)]
+            delay = self.random.uniform(0, 12)
+            rows.append(['2025-01-06', f"Port {port}", country, country_code, f"P{port:06d}", f"{delay:.1f}",
+                         f"{delay:.0f} days", self.random.choice(['Low', 'Average', 'High']),
+                         self.coordinate(self.random.uniform(-50, 60), 0), self.number(-180, 180, 4),
+                         self.number(0, 10), self.number(0, 20), self.number(0, 10), self.number(0, 20),
+                         self.number(0, 10), self.random.choice([self.number(0, 30), 'N/A'])])
+        return rows
+
+    def air(self):
+        rows = []
+        for i in range(self.rows):
+            name, lat, lng = HUBS[i % len(HUBS)]
+            scheduled = self.random.randint(50, 900)
+            rows.append([f"A{i:03d}", str(scheduled), str(scheduled - 3), str(scheduled - 5), '3',
+                         self.number(90, 100), self.number(5, 30), self.number(5, 30), self.number(20, 80),
+                         self.number(8, 30), '2025-01-06 12:00', self.coordinate(lat, 0.5),
+                         self.number(lng - 0.5, lng + 0.5, 4), 'US-XX', name])
+        return rows
+
+    def workbook(self):
+        shared = []
+        bodies = {
+            'CONGESTION_TRUCK': self.truck(),
+            'CONGESTION_RAIL': self.rail(shared),
+            'CONGESTION_RAIL2': self.rail2(shared),
+            'CONGESTION_OCEAN': self.ocean(),
+            'CONGESTION_AIR': self.air(),
+        }
+        return {title: [HEADERS[title]] + body for title, body in bodies.items()}
+
+def generate_workbook(rows=1000, duplicate_ratio=0.1, missing_coordinate_rate=0.02, seed=0):
+    # Worksheet title -> values (header row first), as strings like the Sheets API returns
+    return WorkbookGenerator(rows, duplicate_ratio, missing_coordinate_rate, seed).workbook()
+
+FakeResponse = namedtuple('FakeResponse', ['status_code', 'headers'])
+
+class FakeAPIError(Exception):
+    # Shaped like gspread.exceptions.APIError: the HTTP response is on .response
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code} from the fake Sheets API")
+        headers = {'Retry-After': f"{retry_after:.3f}"} if retry_after is not None else {}
+        self.response = FakeResponse(status_code, headers)
+
+class FakeSpreadsheet:
+    # latency: seconds added to every API call, to model the Sheets round trip
+    # quota_per_minute: answer 429 past this many calls in a sliding minute (0: no quota)
+    # error_rate: share of calls failing with a random 429, 500 or 503
+    def __init__(self, worksheets, latency=0.0, quota_per_minute=0, error_rate=0.0, seed=0):
+        self.worksheets = worksheets
+        self.latency = latency
+        self.quota_per_minute = quota_per_minute
+        self.error_rate = error_rate
+        self.calls = 0
+        self.failures = 0
+        self._recent = deque()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def check_quota(self):
+        # Called with the lock held; raises like the API would
+        now = time.monotonic()
+        if self.quota_per_minute:
+            while self._recent and self._recent[0] <= now - 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.quota_per_minute:
+                raise FakeAPIError(429)
+            self._recent.append(now)
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise FakeAPIError(self._random.choice([429, 500, 503]))
+
+    def read_range(self, rng):
+        # (values, A1 range clipped to the worksheet grid), like the API's valueRange
+        title, _, cells = rng.partition('!')
+        values = self.worksheets[title.strip("'")]
+        grid_rows = max(len(values), 1)
+        if not cells:
+            return values, f"{title}!A1:{grid_rows}"
+        match = re.fullmatch(r'([A-Z]*)(\d*):([A-Z]*)(\d*)', cells)
+        if not match:
+            raise ValueError(f"Unsupported range: {rng}")
+        first_col, first_row, last_col, last_row = match.groups()
+        first_row = int(first_row or 1)
+        last_row = min(int(last_row) if last_row else grid_rows, grid_rows)
+        rows = values[first_row - 1:last_row]
+        first = column_index(first_col) if first_col else 0
+        rows = [row[first:column_index(last_col) + 1] if last_col else row[first:] for row in rows]
+        return rows, f"{title}!{first_col}{first_row}:{last_col}{max(last_row, first_row)}"
+
+    def values_batch_get(self, ranges, params=None):
+        with self._lock:
+            self.calls += 1
+            try:
+                self.check_quota()
+            except FakeAPIError:
+                self.failures += 1
+                raise
+        if self.latency:
+            time.sleep(self.latency)
+        value_ranges = []
+        for rng in ranges:
+            values, clipped = self.read_range(rng)
+            value_range = {'range': clipped, 'majorDimension': 'ROWS'}
+            # Like the API: trailing empty rows and cells are dropped, empty ranges have no 'values'
+            values = [trim_row(row) for row in values]
+            while values and not values[-1]:
+                values.pop()
+            if values:
+                value_range['values'] = values
+            value_ranges.append(value_range)
+        return {'valueRanges': value_ranges}
@@ -1,93 +1,129 @@
 # scripts/fetch_air_data.py
-import os
-import gspread
-import json
-from google.oauth2 import service_account
+from sheet_access import split_header, worksheet_range
+from row_decoder import RowDecoder, number, text
+from output_format import write_output
+from tiling import write_tiles
+from map_layout import write_layout
+from cluster_index import is_number
+from summary import Rollup, Worst
+from patches import key_entities
+from publish import Publication, publish
+from metrics import count, for_mode, stage
 
-def safe_convert(val, default=None):
-    if val in [None, "", " ", "N/A", "NaN"]:
-        return default
-    try:
-        return float(val) if "." in str(val) else int(val)
-    except (ValueError, TypeError):
-        return default
+# Columns A:O of every row, header included, read in pages down to the last airport
+AIR_RANGE = worksheet_range('CONGESTION_AIR', 'A:O')
+AIR_RANGES = [AIR_RANGE]
+# Bump whenever the transform below changes its output for the same rows.
+AIR_TRANSFORM_VERSION = 4
 
-def fetch_air_data():
-    print("🔵 Starting Air Data Collection")
-    try:
-        creds_dict = eval(os.environ['GOOGLE_CREDENTIAL_JSON'])
-        creds = service_account.Credentials.from_service_account_info(
-            creds_dict,
-            scopes=['https://www.googleapis.com/auth/spreadsheets']
-        )
-        gc = gspread.authorize(creds)
-        print("✅ Google Authentication Successful")
-        
-        spreadsheet_id = os.environ['SPREADSHEET_ID']
-        sheet = gc.open_by_key(spreadsheet_id)
-        worksheet = sheet.worksheet('CONGESTION_AIR')
-        
-        records = worksheet.get('A2:O61')
-        headers = worksheet.get('A1:O1')[0]
+# lat/lng duplicate latitude_deg/longitude_deg, which is what js/air_map.js reads
+AIR_DROP_FIELDS = ('lat', 'lng')
+AIR_DICTIONARY_FIELDS = ('iso_region', 'municipality', 'last_updated')
+AIR_TREND_FIELDS = ('average_txo', 'scheduled', 'departed', 'completion_factor')
 
-        print(f"📝 Number of records fetched: {len(records)}")
-        
-        result = []
-        for i, row in enumerate(records):
+# 'Town, CA', as listed in the location dropdown of js/air_map.js
+def airport_location(record):
+    if not record['municipality'].strip() or not record['iso_region'].strip():
+        return None
+    return f"{record['municipality']}, {record['iso_region'].split('-')[-1]}"
+
+# Filter facets published in us-air.layout.json
+AIR_FACETS = {
+    'location': airport_location,
+    'iso_region': lambda record: record['iso_region'],
+}
+
+# Cancelled flights as a share of scheduled ones, in percent
+def cancellation_percent(record):
+    if not is_number(record['cancelled']) or not is_number(record['scheduled']) or record['scheduled'] <= 0:
+        return None
+    return round(record['cancelled'] / record['scheduled'] * 100, 4)
+
+# Rollups published in us-air.summary.json
+AIR_STATS = {
+    'completion_factor': lambda record: record['completion_factor'],
+    'cancelled': lambda record: record['cancelled'],
+    'cancellation_percent': cancellation_percent,
+    'd15': lambda record: record['d15'],
+}
+AIR_ROLLUPS = {
+    'all': Rollup(stats=AIR_STATS),
+    'iso_region': Rollup(group=lambda record: record['iso_region'], stats=AIR_STATS,
+                         worst=Worst(cancellation_percent, ('airport_code', 'municipality', 'scheduled', 'cancelled'))),
+}
+
+# Output field -> (sheet column, converter), in output order
+AIR_SCHEMA = [
+    ('airport_code', 'Code', text),
+    ('scheduled', 'Scheduled', number),
+    ('completed', 'Completed', number),
+    ('departed', 'Departed', number),
+    ('cancelled', 'Cancelled', number),
+    ('completion_factor', 'Completion Factor', number),
+    ('d15', 'D15', number),
+    ('a14', 'A14', number),
+    ('d0_percent', 'D0 Percent', number),
+    ('average_txo', 'Average TXO', number),
+    ('last_updated', 'Last Updated', text),
+    ('latitude_deg', 'latitude_deg', number),
+    ('longitude_deg', 'longitude_deg', number),
+    ('lat', 'latitude_deg', number),
+    ('lng', 'longitude_deg', number),
+    ('iso_region', 'iso_region', text),
+    ('municipality', 'municipality', text),
+]
+
+# Sheet values -> airport records
+def transform_air(values):
+    headers, records = split_header(values)
+    decoder = RowDecoder(AIR_SCHEMA, headers)
+
+    with stage('transform.decode'):
+        rows, short = [], 0
+        for row in records:
             if len(row) < len(headers):
-                print(f"⚠️ Skipping row {i+2} due to insufficient columns. Expected {len(headers)}, got {len(row)}.")
-                continue
+                short += 1
+            else:
+                rows.append(row)
+        count('skipped.short_row', short)
+        records = decoder.decode_rows(rows, decoder.decode_record)
 
-            try:
-                row_dict = dict(zip(headers, row))
-                
-                lat = safe_convert(row_dict.get('latitude_deg'))
-                lng = safe_convert(row_dict.get('longitude_deg'))
-                code = row_dict.get('Code', '').strip()
-                if None in [lat, lng] or not code:
-                    print(f"⚠️ Skipping row {i+2} (Code: {code}) due to missing Lat/Lng or Airport Code.")
-                    continue
-                
-                data = {
-                    'airport_code': code,
-                    'scheduled': safe_convert(row_dict.get('Scheduled')),
-                    'completed': safe_convert(row_dict.get('Completed')),
-                    'departed': safe_convert(row_dict.get('Departed')),
-                    'cancelled': safe_convert(row_dict.get('Cancelled')),
-                    'completion_factor': safe_convert(row_dict.get('Completion Factor')),
-                    'd15': safe_convert(row_dict.get('D15')),
-                    'a14': safe_convert(row_dict.get('A14')),
-                    'd0_percent': safe_convert(row_dict.get('D0 Percent')),
-                    'average_txo': safe_convert(row_dict.get('Average TXO')),
-                    'last_updated': row_dict.get('Last Updated', '').strip(),
-                    'latitude_deg': lat,
-                    'longitude_deg': lng,
-                    'lat': lat,
-                    'lng': lng,
-                    'iso_region': row_dict.get('iso_region', '').strip(),
-                    'municipality': row_dict.get('municipality', '').strip()
-                }
-                
-                result.append(data)
-                
-            except Exception as e:
-                print(f"⚠️ Error processing row {i+2} (Code: {row_dict.get('Code', 'Unknown')}): {str(e)}")
-                continue
-        
-        output_dir = os.path.join(os.path.dirname(__file__), '../data')
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, 'us-air.json')
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
-            
-        print(f"✅ Air data saved to: {output_path}")
-        print(f"🔄 Number of data entries generated: {len(result)}")
-        
-        if result:
-            print("\n🔍 Sample Data:")
-            print(json.dumps(result[0], indent=2))
-            
+    result = []
+    for data in records:
+        code = data['airport_code']
+        if data['lat'] is None or data['lng'] is None or not code:
+            count('skipped.missing_coordinates_or_code')
+            continue
+
+        result.append(data)
+    return result
+
+def write_air_outputs(output_path, result):
+    write_output(output_path, result, drop=AIR_DROP_FIELDS, dictionary=AIR_DICTIONARY_FIELDS)
+    write_tiles(output_path, result, ('latitude_deg', 'longitude_deg'), drop=AIR_DROP_FIELDS, dictionary=AIR_DICTIONARY_FIELDS)
+    write_layout(output_path, result, ('latitude_deg', 'longitude_deg'), facets=AIR_FACETS)
+
+AIR_PUBLICATION = Publication(
+    mode='air',
+    filename='us-air.json',
+    sources=[('CONGESTION_AIR', AIR_RANGE)],
+    version=lambda: AIR_TRANSFORM_VERSION,
+    transform=lambda values: transform_air(values['CONGESTION_AIR']),
+    write=write_air_outputs,
+    rollups=AIR_ROLLUPS,
+    entities=lambda result: key_entities(result, lambda record: record['airport_code']),
+    trend_fields=AIR_TREND_FIELDS,
+    drop=AIR_DROP_FIELDS,
+)
+
+@for_mode('air')
+def fetch_air_data(reader=None, fingerprints=None, history=None):
+    print("🔵 Starting Air Data Collection")
+    try:
+        output_path, result = publish(AIR_PUBLICATION, reader, fingerprints, history)
+        if result is not None:
+            print(f"✅ Air data saved to: {output_path}")
+            print(f"🔄 Number of data entries generated: {len(result)}")
         return True
         
     except Exception as e:
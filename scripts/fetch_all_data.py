@@ -0,0 +1,136 @@
+# scripts/fetch_all_data.py
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from sheets import open_spreadsheet
+from sheet_access import SheetReader
+from change_detection import FingerprintStore
+from history_store import HistoryStore
+from cluster_index import build_cluster_indexes
+from metrics import RUN_METRICS, stage
+from output_format import data_dir
+from fetch_truck_data import fetch_truck_data, TRUCK_RANGES
+from fetch_rail_data import fetch_rail_data, RAIL_RANGES
+from fetch_ocean_data import fetch_ocean_data, OCEAN_RANGES
+from fetch_air_data import fetch_air_data, AIR_RANGES
+
+FETCHERS = {
+    'truck': fetch_truck_data,
+    'rail': fetch_rail_data,
+    'ocean': fetch_ocean_data,
+    'air': fetch_air_data,
+}
+
+SHEET_RANGES = {
+    'truck': TRUCK_RANGES,
+    'rail': RAIL_RANGES,
+    'ocean': OCEAN_RANGES,
+    'air': AIR_RANGES,
+}
+
+METRICS_FILENAME = '.metrics.json'
+
+def metrics_path():
+    return os.environ.get('FETCH_METRICS_PATH') or os.path.join(data_dir(), METRICS_FILENAME)
+
+def fetch_all_data(modes=None, sheet=None, fingerprints=None, history=None, serial=False, source=None):
+    modes = list(modes or FETCHERS)
+    print(f"🔵 Starting Data Collection for: {', '.join(modes)}")
+    try:
+        # Authorize and open the spreadsheet once; every fetcher shares it.
+        if sheet is None:
+            with stage('auth'):
+                sheet = open_spreadsheet(source)
+    except Exception as e:
+        print(f"❌ Critical error during authentication: {str(e)}")
+        return {mode: False for mode in modes}
+
+    reader = SheetReader(sheet)
+    try:
+        # One batch request for the first page of every selected worksheet;
+        # the fetchers stream any further pages themselves.
+        with stage('fetch'):
+            reader.prefetch_pages([rng for mode in modes for rng in SHEET_RANGES[mode]])
+    except Exception as e:
+        # Leave it to each fetcher to retry its own ranges and report failure.
+        print(f"⚠️ Batch read failed, falling back to per-mode reads: {str(e)}")
+
+    if fingerprints is None:
+        fingerprints = FingerprintStore()
+    if history is None:
+        history = HistoryStore()
+
+    if serial:
+        # One thread, so a profiler attached to it sees every fetcher
+        results = {mode: FETCHERS[mode](reader, fingerprints, history) for mode in modes}
+    else:
+        # The fetchers spend most of their time waiting on the Sheets API, so
+        # running them side by side brings the total close to the slowest mode.
+        with ThreadPoolExecutor(max_workers=len(modes)) as executor:
+            futures = {mode: executor.submit(FETCHERS[mode], reader, fingerprints, history) for mode in modes}
+            results = {mode: future.result() for mode, future in futures.items()}
+
+    # Publish-time clustering for the point maps, from whatever is on disk now
+    clustered = build_cluster_indexes([mode for mode, ok in results.items() if ok], fingerprints.changed)
+    for mode, ok in clustered.items():
+        results[mode] = results[mode] and ok
+
+    print("\n📋 Data Collection Summary:")
+    for mode, ok in results.items():
+        status = 'changed' if fingerprints.changed.get(mode) else 'unchanged' if ok else 'failed'
+        print(f"{'✅' if ok else '❌'} {mode} ({status})")
+    return results
+
+def report_modes(changed_modes, failed_modes):
+    print(f"🔄 Changed modes: {', '.join(changed_modes) or 'none'}")
+    # Lets the deploy workflow skip publishing when nothing changed, and
+    # still publish the other modes before it fails the job for a failed one.
+    github_output = os.environ.get('GITHUB_OUTPUT')
+    if github_output:
+        with open(github_output, 'a', encoding='utf-8') as f:
+            f.write(f"changed={','.join(changed_modes)}\n")
+            f.write(f"failed={','.join(failed_modes)}\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch congestion data for one or more transport modes.")
+    parser.add_argument('modes', nargs='*', metavar='MODE',
+                        help=f"modes to fetch ({', '.join(FETCHERS)}); defaults to all")
+    parser.add_argument('--source', metavar='PATH',
+                        help="read local exports (a directory or .xlsx workbook) instead of Google Sheets; default FETCH_SOURCE")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help=f"where to write the run metrics (default: FETCH_METRICS_PATH or data/{METRICS_FILENAME})")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="run the fetchers one after another under cProfile and save the stats to PATH")
+    args = parser.parse_args(argv)
+    unknown = [mode for mode in args.modes if mode not in FETCHERS]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+
+    RUN_METRICS.reset()
+    fingerprints = FingerprintStore()
+    if args.profile:
+        profiler = cProfile.Profile()
+        results = profiler.runcall(fetch_all_data, args.modes, fingerprints=fingerprints, serial=True,
+                                   source=args.source)
+        profiler.dump_stats(args.profile)
+        print(f"📝 Profile saved to: {args.profile}")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+    else:
+        results = fetch_all_data(args.modes, fingerprints=fingerprints, source=args.source)
+    report_modes([mode for mode in results if fingerprints.changed.get(mode)],
+                 [mode for mode, ok in results.items() if not ok])
+
+    RUN_METRICS.print_summary()
+    path = args.metrics or metrics_path()
+    try:
+        RUN_METRICS.write(path)
+        print(f"📝 Metrics saved to: {path}")
+    except OSError as e:
+        print(f"⚠️ Could not write metrics to {path}: {str(e)}")
+    return 0 if all(results.values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,82 +1,100 @@
 # scripts/fetch_ocean_data.py
-import os
-import gspread
-import json
-from google.oauth2 import service_account
+from sheet_access import split_header, worksheet_range
+from row_decoder import RowDecoder, lower_text, number, text
+from output_format import write_output
+from tiling import write_tiles
+from map_layout import write_layout
+from summary import Rollup, Worst
+from patches import key_entities
+from publish import Publication, publish
+from metrics import count, for_mode, stage
 
-def safe_convert(val, default=None):
-    if val in [None, "", " ", "N/A", "NaN"]:
-        return default
-    try:
-        return float(val) if "." in str(val) else int(val)
-    except (ValueError, TypeError):
-        return default
+OCEAN_RANGE = worksheet_range('CONGESTION_OCEAN')
+OCEAN_RANGES = [OCEAN_RANGE]
+# Bump whenever the transform below changes its output for the same rows.
+OCEAN_TRANSFORM_VERSION = 4
+
+OCEAN_DICTIONARY_FIELDS = ('country', 'country_code', 'delay_level', 'date')
+OCEAN_TREND_FIELDS = ('current_delay', 'current_delay_days', 'delay_level')
+
+# Filter facets published in global-ports.layout.json
+OCEAN_FACETS = {
+    'country': lambda record: record['country'],
+    'delay_level': lambda record: record['delay_level'],
+}
+# Rollups published in global-ports.summary.json
+OCEAN_LEVEL_COUNTS = {'delay_level': lambda record: record['delay_level']}
+OCEAN_DELAY_STATS = {'current_delay_days': lambda record: record['current_delay_days']}
+OCEAN_ROLLUPS = {
+    'all': Rollup(counts=OCEAN_LEVEL_COUNTS, stats=OCEAN_DELAY_STATS),
+    'country': Rollup(group=lambda record: record['country'], counts=OCEAN_LEVEL_COUNTS, stats=OCEAN_DELAY_STATS,
+                      worst=Worst(lambda record: record['current_delay_days'], ('port', 'port_code', 'current_delay_days'))),
+}
+# Ports are spread wider than yards and airports, as js/ocean_map.js always did
+OCEAN_FAN_OUT_DEGREES = 0.15
+
+# Output field -> (sheet column, converter), in output order
+OCEAN_SCHEMA = [
+    ('date', 'Date', text),
+    ('port', 'Port', text),
+    ('country', 'Country', text),
+    ('country_code', 'Country Code', lower_text),
+    ('port_code', 'Port Code', text),
+    ('current_delay_days', 'Current Delay (days)', number),
+    ('current_delay', 'Current Delay', text),
+    ('delay_level', 'Delay Level', lower_text),
+    ('lat', 'Latitude', number),
+    ('lng', 'Longitude', number),
+    ('weekly_median_delay', 'Weekly Median Delay', number),
+    ('weekly_max_delay', 'Weekly Max Delay', number),
+    ('fortnightly_median_delay', 'Fortnightly Median Delay', number),
+    ('fortnightly_max_delay', 'Fortnightly Max Delay', number),
+    ('monthly_median_delay', 'Monthly Median Delay', number),
+    ('monthly_max_delay', 'Monthly Max Delay', number),
+]
+
+# Sheet values -> port records
+def transform_ocean(values):
+    headers, rows = split_header(values)
+    decoder = RowDecoder(OCEAN_SCHEMA, headers)
+
+    with stage('transform.decode'):
+        records = decoder.decode_rows(rows, decoder.decode_record)
+
+    result = []
+    for data in records:
+        if data['lat'] is None or data['lng'] is None:
+            count('skipped.missing_coordinates')
+            continue
+
+        result.append(data)
+    return result
 
-def fetch_ocean_data():
+def write_ocean_outputs(output_path, result):
+    write_output(output_path, result, dictionary=OCEAN_DICTIONARY_FIELDS)
+    write_tiles(output_path, result, dictionary=OCEAN_DICTIONARY_FIELDS)
+    write_layout(output_path, result, radius=OCEAN_FAN_OUT_DEGREES, facets=OCEAN_FACETS)
+
+OCEAN_PUBLICATION = Publication(
+    mode='ocean',
+    filename='global-ports.json',
+    sources=[('CONGESTION_OCEAN', OCEAN_RANGE)],
+    version=lambda: OCEAN_TRANSFORM_VERSION,
+    transform=lambda values: transform_ocean(values['CONGESTION_OCEAN']),
+    write=write_ocean_outputs,
+    rollups=OCEAN_ROLLUPS,
+    entities=lambda result: key_entities(result, lambda record: record['port_code'] or record['port']),
+    trend_fields=OCEAN_TREND_FIELDS,
+)
+
+@for_mode('ocean')
+def fetch_ocean_data(reader=None, fingerprints=None, history=None):
     print("🔵 Starting Ocean Data Collection")
     try:
-        creds_dict = eval(os.environ['GOOGLE_CREDENTIAL_JSON'])
-        creds = service_account.Credentials.from_service_account_info(
-            creds_dict,
-            scopes=['https://www.googleapis.com/auth/spreadsheets']
-        )
-        gc = gspread.authorize(creds)
-        print("✅ Google Authentication Successful")
-        
-        spreadsheet_id = os.environ['SPREADSHEET_ID']
-        sheet = gc.open_by_key(spreadsheet_id)
-        worksheet = sheet.worksheet('CONGESTION_OCEAN')
-        records = worksheet.get_all_records()
-        print(f"📝 Number of records fetched: {len(records)}")
-        
-        result = []
-        for row in records:
-            try:
-                lat = safe_convert(row.get('Latitude'))
-                lng = safe_convert(row.get('Longitude'))
-                if None in [lat, lng]:
-                    print(f"⚠️ Skipping row due to missing Latitude/Longitude for Port: {row.get('Port', 'Unknown')}")
-                    continue
-                
-                data = {
-                    'date': str(row.get('Date', '')).strip(),
-                    'port': str(row.get('Port', '')).strip(),
-                    'country': str(row.get('Country', '')).strip(),
-                    'country_code': str(row.get('Country Code', '')).strip().lower(),
-                    'port_code': str(row.get('Port Code', '')).strip(),
-                    'current_delay_days': safe_convert(row.get('Current Delay (days)')),
-                    'current_delay': str(row.get('Current Delay', '')).strip(),
-                    'delay_level': str(row.get('Delay Level', '')).strip().lower(),
-                    'lat': lat,
-                    'lng': lng,
-                    'weekly_median_delay': safe_convert(row.get('Weekly Median Delay')),
-                    'weekly_max_delay': safe_convert(row.get('Weekly Max Delay')),
-                    'fortnightly_median_delay': safe_convert(row.get('Fortnightly Median Delay')),
-                    'fortnightly_max_delay': safe_convert(row.get('Fortnightly Max Delay')),
-                    'monthly_median_delay': safe_convert(row.get('Monthly Median Delay')),
-                    'monthly_max_delay': safe_convert(row.get('Monthly Max Delay'))
-                }
-                
-                result.append(data)
-                
-            except Exception as e:
-                print(f"⚠️ Error processing row for Port {row.get('Port', 'Unknown')}: {str(e)}")
-                continue
-        
-        output_dir = os.path.join(os.path.dirname(__file__), '../data')
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, 'global-ports.json') 
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
-            
-        print(f"✅ Ocean data saved to: {output_path}")
-        print(f"🔄 Number of data entries generated: {len(result)}")
-        
-        if result:
-            print("\n🔍 Sample Data:")
-            print(json.dumps(result[0], indent=2))
-            
+        output_path, result = publish(OCEAN_PUBLICATION, reader, fingerprints, history)
+        if result is not None:
+            print(f"✅ Ocean data saved to: {output_path}")
+            print(f"🔄 Number of data entries generated: {len(result)}")
         return True
         
     except Exception as e:
@@ -1,36 +1,73 @@
 import os
-import gspread
-import json
 import re # Import the regular expression module
-from google.oauth2 import service_account
+from functools import lru_cache
 from datetime import datetime
+from sheet_access import split_header, worksheet_range
+from row_decoder import RowDecoder, decimal, text
+from output_format import write_output
+from tiling import write_tiles
+from map_layout import write_layout
+from summary import Rollup, Worst
+from patches import key_entities
+from publish import Publication, publish
+from metrics import count, for_mode, stage
+from priority_merge import PriorityMerge, PriorityRule, tier_name
+from spatial_dedup import proximity_dedup
 
-# Function to safely convert values to float or int, returning default (None) for invalid values
-def safe_convert(val, default=None):
-    if val in [None, "", " ", "N/A", "NaN"]:
-        return default
-    try:
-        # Always try to convert to float for numerical stability, especially for lat/lng
-        return float(val)
-    except (ValueError, TypeError):
-        return default
+RAIL_RANGE = worksheet_range('CONGESTION_RAIL')
+RAIL2_RANGE = worksheet_range('CONGESTION_RAIL2')
+RAIL_RANGES = [RAIL_RANGE, RAIL2_RANGE]
+# Bump whenever the transform below changes its output for the same rows.
+RAIL_TRANSFORM_VERSION = 5
+
+# Near-duplicate yards: same company, within this many meters and with names at
+# least this similar (0..1) count as one yard. RAIL_DEDUP_RADIUS_M=0 turns it off.
+RAIL_DEDUP_RADIUS_M = 500
+RAIL_DEDUP_SIMILARITY = 0.8
+
+# Yard duplicates location, which is what js/rail_map.js reads
+RAIL_DROP_FIELDS = ('Yard',)
+RAIL_DICTIONARY_FIELDS = ('company', 'congestion_level', 'date')
+RAIL_TREND_FIELDS = ('dwell_time', 'Average', 'indicator', 'congestion_level')
+
+# Filter facets published in us-rail.layout.json; Yard is the yard dropdown
+RAIL_FACETS = {
+    'Yard': lambda record: record['location'],
+    'company': lambda record: record['company'],
+    'congestion_level': lambda record: record['congestion_level'],
+}
+
+# Rollups published in us-rail.summary.json
+RAIL_LEVEL_COUNTS = {'congestion_level': lambda record: record['congestion_level']}
+RAIL_DWELL_STATS = {'dwell_time': lambda record: record['dwell_time']}
+RAIL_ROLLUPS = {
+    'all': Rollup(counts=RAIL_LEVEL_COUNTS, stats=RAIL_DWELL_STATS),
+    'company': Rollup(group=lambda record: record['company'], counts=RAIL_LEVEL_COUNTS, stats=RAIL_DWELL_STATS,
+                      worst=Worst(lambda record: record['dwell_time'], ('location', 'dwell_time', 'congestion_level'))),
+}
+
+# Patterns used by normalize_location_name, compiled once since it runs for every row
+NON_ALPHANUMERIC_PATTERN = re.compile(r'[^a-zA-Z0-9\s]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
 
 # Function to normalize location names for consistent deduplication.
 # This version aggressively cleans and formats the string for key generation.
+# Cached because the same yard names recur across both sheets and many rows.
+@lru_cache(maxsize=None)
 def normalize_location_name(location_str):
     if not isinstance(location_str, str):
         return ""
     
     # Remove all non-alphanumeric characters except spaces
     # This handles periods, commas, hyphens, etc., replacing them effectively
-    normalized = re.sub(r'[^a-zA-Z0-9\s]', '', location_str)
+    normalized = NON_ALPHANUMERIC_PATTERN.sub('', location_str)
     
     # Convert to uppercase
     normalized = normalized.upper()
     
     # Replace any sequence of one or more spaces with a single underscore
     # Then remove any leading/trailing underscores that might result from trimming
-    normalized = re.sub(r'\s+', '_', normalized).strip('_')
+    normalized = WHITESPACE_PATTERN.sub('_', normalized).strip('_')
     
     return normalized
 
@@ -49,217 +86,186 @@ def get_congestion_level_from_dwell_time(dwell_time):
         return 'Low'
     return 'Very Low'
 
-def fetch_rail_data():
-    print("🔵 Starting Rail Data Collection")
-    try:
-        # Load Google service account credentials from environment variable
-        creds_dict = eval(os.environ['GOOGLE_CREDENTIAL_JSON'])
-        creds = service_account.Credentials.from_service_account_info(
-            creds_dict,
-            scopes=['https://www.googleapis.com/auth/spreadsheets']
+# Source priority for the rail merge, highest first. A row takes the rank of the
+# first rule matching its sheet and company; CP and KCS yards are published as CPKC.
+# Within CONGESTION_RAIL the last row for a key wins, elsewhere the first one does.
+RAIL_PRIORITY_RULES = [
+    PriorityRule('CONGESTION_RAIL', keep='last'),
+    PriorityRule('CONGESTION_RAIL2', companies={'CPKC'}),
+    PriorityRule('CONGESTION_RAIL2', companies={'CP', 'KCS'}, alias='CPKC'),
+    PriorityRule('CONGESTION_RAIL2'),
+]
+
+# Deduplication key: normalized location, rounded coordinates and (display) company
+def rail_dedup_key(location, lat, lng, company):
+    return f"{normalize_location_name(location)}-{round(lat, 5)}-{round(lng, 5)}-{company.upper()}"
+
+def rail_dedup_settings():
+    radius = float(os.environ.get('RAIL_DEDUP_RADIUS_M', RAIL_DEDUP_RADIUS_M))
+    similarity = float(os.environ.get('RAIL_DEDUP_SIMILARITY', RAIL_DEDUP_SIMILARITY))
+    return radius, similarity
+
+def rail_fingerprint_version():
+    # The dedup settings change the output for the same rows, like a transform change
+    radius, similarity = rail_dedup_settings()
+    return f"{RAIL_TRANSFORM_VERSION}/r{radius:g}/s{similarity:g}"
+
+# Second dedup pass over the exact-key winners, in their priority order: a yard
+# listed again nearby under a slightly different name or position is dropped
+def merge_nearby_yards(records):
+    radius, similarity = rail_dedup_settings()
+    with stage('transform.proximity'):
+        kept, dropped = proximity_dedup(
+            records, radius, similarity,
+            point=lambda r: (r['lat'], r['lng']),
+            name=lambda r: normalize_location_name(r['location']),
+            group=lambda r: r['company'].upper(),
         )
-        gc = gspread.authorize(creds)
-        print("✅ Google Authentication Successful")
-        
-        # Get the spreadsheet ID from environment variable
-        spreadsheet_id = os.environ['SPREADSHEET_ID']
-        sheet = gc.open_by_key(spreadsheet_id)
+    count('duplicates.proximity', dropped)
+    return kept
 
-        # Dictionary to store processed data, using a unique key for deduplication
-        # The key now includes company to allow multiple companies at the same location
-        processed_rail_data = {}
-        
-        # --- Fetch all records from both sheets first ---
-        worksheet_rail = sheet.worksheet('CONGESTION_RAIL')
-        records_rail = worksheet_rail.get_all_records()
-        print(f"📝 Number of records fetched from CONGESTION_RAIL: {len(records_rail)}")
+# 'Category' as written in the sheet, or 'Unknown' if the sheet has no such column
+def category(val):
+    return 'Unknown' if val is None else text(val)
 
-        worksheet_rail2 = sheet.worksheet('CONGESTION_RAIL2')
-        records_rail2 = worksheet_rail2.get_all_records()
-        print(f"📝 Number of records fetched from CONGESTION_RAIL2: {len(records_rail2)}")
+# Columns decoded from CONGESTION_RAIL, in decode order.
+# Numbers are always floats here for numerical stability, especially for lat/lng.
+RAIL_SCHEMA = [
+    ('company', 'Railroad', text),
+    ('location', 'Location', text),
+    ('yard', 'Yard', text),
+    ('lat', 'Latitude', decimal),
+    ('lng', 'Longitude', decimal),
+    ('date', 'Date', text),
+    ('dwell_time', 'Dwell Time', decimal),
+    ('Average', 'Average', decimal),
+    ('indicator', 'Indicator', decimal),
+    ('congestion_level', 'Category', category),
+]
 
-        # --- Processing Order based on Corrected Priority ---
+# Columns decoded from CONGESTION_RAIL2, in decode order
+RAIL2_SCHEMA = [
+    ('company', 'Railroad Company', text),
+    ('location', 'Location', text),
+    ('lat', 'Latitude', decimal),
+    ('lng', 'Longitude', decimal),
+    ('dwell_time', 'Rightmost Dwell Time', decimal),
+    ('date', 'Date of Rightmost Value', text),
+]
 
-        # 1. Process ALL data from CONGESTION_RAIL (Highest Priority)
-        print("Processing CONGESTION_RAIL data (Priority 1/4)...")
-        for row in records_rail:
-            try:
-                raw_lat = safe_convert(row.get('Latitude'))
-                raw_lng = safe_convert(row.get('Longitude'))
-                raw_location = (row.get('Location', '') or row.get('Yard', '')).strip()
-                company_name = str(row.get('Railroad', '')).strip()
-                
-                if raw_lat is None or raw_lng is None or not raw_location:
-                    print(f"Skipping CONGESTION_RAIL row due to missing essential data: {raw_location or 'Unknown Location'}")
-                    continue
+# Pick the fields a decoded CONGESTION_RAIL row is validated and keyed on:
+# (company, location, lat, lng, complete)
+def parse_rail_row(values):
+    company_name, location, yard, raw_lat, raw_lng = values[:5]
+    raw_location = location or yard
+    complete = raw_lat is not None and raw_lng is not None and bool(raw_location)
+    return company_name, raw_location, raw_lat, raw_lng, complete
 
-                normalized_location_for_key = normalize_location_name(raw_location)
-                lat_for_key = round(raw_lat, 5) 
-                lng_for_key = round(raw_lng, 5)
-                # Key now includes company name
-                key = f"{normalized_location_for_key}-{lat_for_key}-{lng_for_key}-{company_name.upper()}" 
-                
-                processed_rail_data[key] = {
-                    'date': str(row.get('Date', '')).strip(),
-                    'company': company_name, 
-                    'location': raw_location, 
-                    'Yard': raw_location, # Add 'Yard' field for JavaScript consistency
-                    'lat': raw_lat,
-                    'lng': raw_lng,
-                    'dwell_time': safe_convert(row.get('Dwell Time')),
-                    'Average': safe_convert(row.get('Average')), # Renamed to 'Average' to match JS
-                    'indicator': safe_convert(row.get('Indicator')),
-                    'congestion_level': row.get('Category', 'Unknown') 
-                }
-                
-            except Exception as e:
-                print(f"⚠️ Error processing CONGESTION_RAIL row - {raw_location or 'Unknown Location'}: {str(e)}")
-                continue
+def build_rail_record(values, company_name, raw_location):
+    _, _, _, raw_lat, raw_lng, date, dwell_time, average, indicator, congestion_level = values
+    return {
+        'date': date,
+        'company': company_name,
+        'location': raw_location,
+        'Yard': raw_location, # Add 'Yard' field for JavaScript consistency
+        'lat': raw_lat,
+        'lng': raw_lng,
+        'dwell_time': dwell_time,
+        'Average': average, # Renamed to 'Average' to match JS
+        'indicator': indicator,
+        'congestion_level': congestion_level
+    }
 
-        # 2. Process CPKC data from CONGESTION_RAIL2 (Second Priority)
-        print("Processing CPKC data from CONGESTION_RAIL2 (Priority 2/4)...")
-        for row in records_rail2:
-            company = str(row.get('Railroad Company', '')).strip()
-            if company == 'CPKC':
-                try:
-                    raw_lat = safe_convert(row.get('Latitude'))
-                    raw_lng = safe_convert(row.get('Longitude'))
-                    raw_location_from_g = row.get('Location', '').strip() 
-                    dwell_time_rail2 = safe_convert(row.get('Rightmost Dwell Time')) 
-                    
-                    if raw_lat is None or raw_lng is None or dwell_time_rail2 is None or not raw_location_from_g:
-                        print(f"Skipping CPKC row due to missing essential data: {raw_location_from_g or 'Unknown Location'}")
-                        continue
+# Same for CONGESTION_RAIL2, which also needs a dwell time
+def parse_rail2_row(values):
+    company, raw_location_from_g, raw_lat, raw_lng, dwell_time_rail2, _ = values
+    complete = (raw_lat is not None and raw_lng is not None
+                and dwell_time_rail2 is not None and bool(raw_location_from_g))
+    return company, raw_location_from_g, raw_lat, raw_lng, complete
 
-                    normalized_location_for_key = normalize_location_name(raw_location_from_g)
-                    lat_for_key = round(raw_lat, 5) 
-                    lng_for_key = round(raw_lng, 5)
-                    # Key now includes company name (CPKC)
-                    key = f"{normalized_location_for_key}-{lat_for_key}-{lng_for_key}-{company.upper()}"
+def build_rail2_record(values, company, raw_location_from_g):
+    _, _, raw_lat, raw_lng, dwell_time_rail2, date = values
+    return {
+        'date': date,
+        'company': company,
+        'location': raw_location_from_g,
+        'Yard': raw_location_from_g, # Add 'Yard' field for JavaScript consistency
+        'lat': raw_lat,
+        'lng': raw_lng,
+        'dwell_time': dwell_time_rail2,
+        'Average': None, # CONGESTION_RAIL2 doesn't have 'Average'
+        'indicator': None, # CONGESTION_RAIL2 doesn't have 'Indicator'
+        'congestion_level': get_congestion_level_from_dwell_time(dwell_time_rail2)
+    }
 
-                    # Only add if not already covered by CONGESTION_RAIL data with the same location AND company
-                    if key not in processed_rail_data:
-                        processed_rail_data[key] = {
-                            'date': str(row.get('Date of Rightmost Value', '')).strip(),
-                            'company': company, 
-                            'location': raw_location_from_g, 
-                            'Yard': raw_location_from_g, # Add 'Yard' field for JavaScript consistency
-                            'lat': raw_lat,
-                            'lng': raw_lng,
-                            'dwell_time': dwell_time_rail2,
-                            'Average': None, # CONGESTION_RAIL2 doesn't have 'Average', Renamed to 'Average'
-                            'indicator': None, # CONGESTION_RAIL2 doesn't have 'Indicator'
-                            'congestion_level': get_congestion_level_from_dwell_time(dwell_time_rail2) 
-                        }
-                    else:
-                        print(f"Skipping duplicate CPKC row (already covered by CONGESTION_RAIL with same location and company): {raw_location_from_g}")
-                except Exception as e:
-                    print(f"⚠️ Error processing CPKC row from CONGESTION_RAIL2 - {raw_location_from_g or 'Unknown Location'}: {str(e)}")
-                    continue
+# Per-sheet schema, key fields and record builder used by the merge loop
+RAIL_SOURCES = [
+    ('CONGESTION_RAIL', RAIL_RANGE, RAIL_SCHEMA, parse_rail_row, build_rail_record),
+    ('CONGESTION_RAIL2', RAIL2_RANGE, RAIL2_SCHEMA, parse_rail2_row, build_rail2_record),
+]
 
-        # 3. Process CP and KCS data from CONGESTION_RAIL2 (Third Priority - Convert to CPKC)
-        print("Processing CP and KCS data from CONGESTION_RAIL2 (Priority 3/4)...")
-        for row in records_rail2:
-            company = str(row.get('Railroad Company', '')).strip()
-            if company in ['CP', 'KCS']:
-                try:
-                    raw_lat = safe_convert(row.get('Latitude'))
-                    raw_lng = safe_convert(row.get('Longitude'))
-                    raw_location_from_g = row.get('Location', '').strip() 
-                    dwell_time_rail2 = safe_convert(row.get('Rightmost Dwell Time')) 
-                    
-                    if raw_lat is None or raw_lng is None or dwell_time_rail2 is None or not raw_location_from_g:
-                        print(f"Skipping {company} row due to missing essential data: {raw_location_from_g or 'Unknown Location'}")
-                        continue
+# Single pass over both sheets, RAIL_PRIORITY_RULES settle duplicates
+def transform_rail(sheet_values):
+    # The key includes company to allow multiple companies at the same location
+    decoded = {}
+    with stage('transform.decode'):
+        for source, _, schema, _, _ in RAIL_SOURCES:
+            headers, rows = split_header(sheet_values[source])
+            decoded[source] = RowDecoder(schema, headers).decode_rows(rows)
 
-                    normalized_location_for_key = normalize_location_name(raw_location_from_g)
-                    lat_for_key = round(raw_lat, 5) 
-                    lng_for_key = round(raw_lng, 5)
-                    # Key now includes company name (CPKC, as it will be displayed)
-                    key = f"{normalized_location_for_key}-{lat_for_key}-{lng_for_key}-CPKC" # Use CPKC for key as it's converted for display
+    merge = PriorityMerge(RAIL_PRIORITY_RULES)
+    with stage('transform.dedup'):
+        for source, _, _, parse_row, build_record in RAIL_SOURCES:
+            for values in decoded[source]:
+                company, location, lat, lng, complete = parse_row(values)
+                rank, rule = merge.rule_for(source, company)
+                if rank is None:
+                    continue
+                if not complete:
+                    count('skipped.missing_essential')
+                    continue
 
-                    # Only add if not already covered by CONGESTION_RAIL or CPKC data
-                    if key not in processed_rail_data:
-                        processed_rail_data[key] = {
-                            'date': str(row.get('Date of Rightmost Value', '')).strip(),
-                            'company': 'CPKC', # Convert CP/KCS to CPKC for display
-                            'location': raw_location_from_g, 
-                            'Yard': raw_location_from_g, # Add 'Yard' field for JavaScript consistency
-                            'lat': raw_lat,
-                            'lng': raw_lng,
-                            'dwell_time': dwell_time_rail2,
-                            'Average': None, # Renamed to 'Average'
-                            'indicator': None, 
-                            'congestion_level': get_congestion_level_from_dwell_time(dwell_time_rail2) 
-                        }
-                    else:
-                        print(f"Skipping duplicate {company} row (already covered by higher priority data): {raw_location_from_g}")
-                except Exception as e:
-                    print(f"⚠️ Error processing {company} row from CONGESTION_RAIL2 - {raw_location_from_g or 'Unknown Location'}: {str(e)}")
+                display_company = rule.alias or company
+                key = rail_dedup_key(location, lat, lng, display_company)
+                # Only build the record if this row would actually win the key
+                if not merge.accepts(rank, key):
+                    merge.reject(rank)
                     continue
+                merge.offer(rank, key, build_record(values, display_company, location))
 
-        # 4. Process Remaining non-CPKC/CP/KCS data from CONGESTION_RAIL2 (Lowest Priority)
-        print("Processing remaining CONGESTION_RAIL2 data (Priority 4/4)...")
-        for row in records_rail2:
-            company = str(row.get('Railroad Company', '')).strip()
-            # Only process if not CPKC, CP, or KCS (already handled by higher priorities)
-            if company not in ['CPKC', 'CP', 'KCS']:
-                try:
-                    raw_lat = safe_convert(row.get('Latitude'))
-                    raw_lng = safe_convert(row.get('Longitude'))
-                    raw_location_from_g = row.get('Location', '').strip() 
-                    dwell_time_rail2 = safe_convert(row.get('Rightmost Dwell Time')) 
-                    
-                    if raw_lat is None or raw_lng is None or dwell_time_rail2 is None or not raw_location_from_g:
-                        print(f"Skipping remaining CONGESTION_RAIL2 row due to missing essential data: {raw_location_from_g or 'Unknown Location'}")
-                        continue
+    for rank, dropped in merge.dropped.items():
+        count(f"duplicates.{tier_name(RAIL_PRIORITY_RULES[rank])}", dropped)
+    return merge_nearby_yards(merge.results())
 
-                    normalized_location_for_key = normalize_location_name(raw_location_from_g)
-                    lat_for_key = round(raw_lat, 5) 
-                    lng_for_key = round(raw_lng, 5)
-                    # Key now includes company name
-                    key = f"{normalized_location_for_key}-{lat_for_key}-{lng_for_key}-{company.upper()}"
+def write_rail_outputs(output_path, result):
+    write_output(output_path, result, drop=RAIL_DROP_FIELDS, dictionary=RAIL_DICTIONARY_FIELDS)
+    write_tiles(output_path, result, drop=RAIL_DROP_FIELDS, dictionary=RAIL_DICTIONARY_FIELDS)
+    write_layout(output_path, result, facets=RAIL_FACETS)
 
-                    # Only add if not already covered by higher priority data
-                    if key not in processed_rail_data:
-                        processed_rail_data[key] = {
-                            'date': str(row.get('Date of Rightmost Value', '')).strip(),
-                            'company': company, # Keep original company name for other RAIL2 data
-                            'location': raw_location_from_g, 
-                            'Yard': raw_location_from_g, # Add 'Yard' field for JavaScript consistency
-                            'lat': raw_lat,
-                            'lng': raw_lng,
-                            'dwell_time': dwell_time_rail2,
-                            'Average': None, # Renamed to 'Average'
-                            'indicator': None, 
-                            'congestion_level': get_congestion_level_from_dwell_time(dwell_time_rail2) 
-                        }
-                    else:
-                        print(f"Skipping duplicate remaining CONGESTION_RAIL2 row (already covered by higher priority data): {raw_location_from_g}")
-                except Exception as e:
-                    print(f"⚠️ Error processing remaining CONGESTION_RAIL2 row - {raw_location_from_g or 'Unknown Location'}: {str(e)}")
-                    continue
+# The merge only runs when one of the two sheets changed
+RAIL_PUBLICATION = Publication(
+    mode='rail',
+    filename='us-rail.json',
+    sources=[(source, rng) for source, rng, _, _, _ in RAIL_SOURCES],
+    version=rail_fingerprint_version,
+    # Deduplicated records in priority order
+    transform=transform_rail,
+    write=write_rail_outputs,
+    rollups=RAIL_ROLLUPS,
+    entities=lambda result: key_entities(
+        result, lambda r: rail_dedup_key(r['location'], r['lat'], r['lng'], r['company'])),
+    trend_fields=RAIL_TREND_FIELDS,
+    drop=RAIL_DROP_FIELDS,
+)
 
-        # Convert the dictionary values (deduplicated records) to a list
-        result = list(processed_rail_data.values()) 
-        
-        # Define output directory and path
-        output_dir = os.path.join(os.path.dirname(__file__), '../data')
-        os.makedirs(output_dir, exist_ok=True) 
-        output_path = os.path.join(output_dir, 'us-rail.json')
-        
-        # Write the processed data to a JSON file
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
-            
-        print(f"✅ Rail data saved to: {output_path}")
-        print(f"🔄 Total number of data entries generated (deduplicated): {len(result)}")
-        
-        # Print a sample of the generated data for verification
-        if result:
-            print("\n🔍 Sample Data:")
-            print(json.dumps(result[0], indent=2))
-            
+@for_mode('rail')
+def fetch_rail_data(reader=None, fingerprints=None, history=None):
+    print("🔵 Starting Rail Data Collection")
+    try:
+        output_path, result = publish(RAIL_PUBLICATION, reader, fingerprints, history)
+        if result is not None:
+            print(f"✅ Rail data saved to: {output_path}")
+            print(f"🔄 Total number of data entries generated (deduplicated): {len(result)}")
         return True
         
     except Exception as e:
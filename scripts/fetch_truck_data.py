@@ -1,83 +1,93 @@
 import os
-import gspread
-import json
-from google.oauth2 import service_account
-
-def safe_convert(val, default=None):
-    if val in [None, "", " ", "N/A", "NaN"]:
-        return default
-    try:
-        if isinstance(val, str):
-            val = val.replace(",", "").strip()
-        return float(val) if "." in str(val) else int(val)
-    except (ValueError, TypeError):
-        return default
-
-def fetch_truck_data():
+from sheet_access import require_headers, split_header, worksheet_range
+from row_decoder import RowDecoder, number, text
+from output_format import write_output
+from state_topology import write_state_topology
+from summary import Rollup, Worst
+from publish import Publication, publish
+from metrics import count, for_mode, stage
+
+TRUCK_RANGE = worksheet_range('CONGESTION_TRUCK')
+TRUCK_RANGES = [TRUCK_RANGE]
+# Bump whenever the transform below changes its output for the same rows.
+TRUCK_TRANSFORM_VERSION = 3
+
+TRUCK_TREND_FIELDS = ('inboundDelay', 'outboundDelay', 'dwellInbound', 'dwellOutbound')
+
+# National rollup published in us-truck.summary.json
+TRUCK_ROLLUPS = {
+    'all': Rollup(
+        counts={'inboundColor': lambda record: record['inboundColor'],
+                'outboundColor': lambda record: record['outboundColor']},
+        stats={field: lambda record, field=field: record[field] for field in TRUCK_TREND_FIELDS},
+        worst=Worst(lambda record: record['inboundDelay'], ('code', 'name', 'inboundDelay'))),
+}
+
+EXPECTED_HEADERS = [
+    'Code', 'State', 'Inbound Delay', 'Inbound Color',
+    'Outbound Delay', 'Outbound Color', 'Dwell Inbound', 'Dwell Outbound'
+]
+
+def color_scale(val):
+    return max(-3, min(3, int(number(val, 0))))
+
+# Output field -> (sheet column, converter); 'code' becomes the key of the output dict
+TRUCK_SCHEMA = [
+    ('code', 'Code', text),
+    ('name', 'State', text),
+    ('inboundDelay', 'Inbound Delay', number),
+    ('inboundColor', 'Inbound Color', color_scale),
+    ('outboundDelay', 'Outbound Delay', number),
+    ('outboundColor', 'Outbound Color', color_scale),
+    ('dwellInbound', 'Dwell Inbound', number),
+    ('dwellOutbound', 'Dwell Outbound', number),
+]
+
+# Sheet values -> state code -> record
+def transform_truck(values):
+    headers, rows = split_header(values)
+    require_headers(headers, EXPECTED_HEADERS)
+    decoder = RowDecoder(TRUCK_SCHEMA, headers)
+
+    with stage('transform.decode'):
+        records = decoder.decode_rows(rows, decoder.decode_record)
+
+    result = {}
+    for data in records:
+        state_code = data.pop('code')
+        if not state_code:
+            count('skipped.missing_code')
+            continue
+
+        result[state_code] = data
+    return result
+
+def write_truck_outputs(output_path, result):
+    write_output(output_path, result, key='code')
+    write_state_topology(os.path.dirname(output_path), result)
+
+TRUCK_PUBLICATION = Publication(
+    mode='truck',
+    filename='us-truck.json',
+    sources=[('CONGESTION_TRUCK', TRUCK_RANGE)],
+    version=lambda: TRUCK_TRANSFORM_VERSION,
+    transform=lambda values: transform_truck(values['CONGESTION_TRUCK']),
+    write=write_truck_outputs,
+    rollups=TRUCK_ROLLUPS,
+    # States are already keyed by code
+    entities=lambda result: result,
+    trend_fields=TRUCK_TREND_FIELDS,
+    records=lambda result: [{'code': code, **record} for code, record in result.items()],
+)
+
+@for_mode('truck')
+def fetch_truck_data(reader=None, fingerprints=None, history=None):
     print("🔵 Starting Truck Data Collection")
     try:
-        creds_dict = eval(os.environ['GOOGLE_CREDENTIAL_JSON'])
-        creds = service_account.Credentials.from_service_account_info(
-            creds_dict,
-            scopes=['https://www.googleapis.com/auth/spreadsheets']
-        )
-        gc = gspread.authorize(creds)
-        print("✅ Google Authentication Successful")
-
-        spreadsheet_id = os.environ['SPREADSHEET_ID']
-        sheet = gc.open_by_key(spreadsheet_id)
-        worksheet = sheet.worksheet('CONGESTION_TRUCK')
-
-        expected_headers = [
-            'Code', 'State', 'Inbound Delay', 'Inbound Color',
-            'Outbound Delay', 'Outbound Color', 'Dwell Inbound', 'Dwell Outbound'
-        ]
-        records = worksheet.get_all_records(expected_headers=expected_headers)
-
-        print(f"📝 Number of records fetched: {len(records)}")
-
-        result = {}
-        for row in records:
-            try:
-                state_code = row.get('Code')
-                if not state_code:
-                    print(f"⚠️ Skipping row due to missing State Code: {row.get('State')}")
-                    continue
-
-                data = {
-                    'name': str(row.get('State', 'Unknown')).strip(),
-                    'inboundDelay': safe_convert(row.get('Inbound Delay')),
-                    'inboundColor': int(safe_convert(row.get('Inbound Color'), 0)),
-                    'outboundDelay': safe_convert(row.get('Outbound Delay')),
-                    'outboundColor': int(safe_convert(row.get('Outbound Color'), 0)),
-                    'dwellInbound': safe_convert(row.get('Dwell Inbound')),
-                    'dwellOutbound': safe_convert(row.get('Dwell Outbound'))
-                }
-
-                for color_field in ['inboundColor', 'outboundColor']:
-                    data[color_field] = max(-3, min(3, data[color_field]))
-
-                result[state_code] = data
-
-            except Exception as e:
-                print(f"⚠️ Error processing row for State {row.get('State', 'Unknown')}: {str(e)}")
-                continue
-
-        output_dir = os.path.join(os.path.dirname(__file__), '../data')
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, 'us-truck.json')
-
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
-
-        print(f"✅ Truck data saved to: {output_path}")
-        print(f"🔄 Number of States processed: {len(result)}")
-
-        if result:
-            sample_state_code = next(iter(result))
-            print("\n🔍 Sample Data:")
-            print(json.dumps({sample_state_code: result[sample_state_code]}, indent=2, ensure_ascii=False))
-
+        output_path, result = publish(TRUCK_PUBLICATION, reader, fingerprints, history)
+        if result is not None:
+            print(f"✅ Truck data saved to: {output_path}")
+            print(f"🔄 Number of States processed: {len(result)}")
         return True
 
     except Exception as e:
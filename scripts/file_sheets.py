@@ -0,0 +1,203 @@
+# scripts/file_sheets.py
+# Local exports of the CONGESTION_* worksheets as a stand-in for the live
+# spreadsheet: answers the values_batch_get call SheetReader makes, so every
+# fetcher reads them with the same headers and cleaning rules as the sheet.
+#
+#   FETCH_SOURCE=exports/ python scripts/fetch_all_data.py
+#   python scripts/fetch_all_data.py --source exports/congestion.xlsx
+#
+# A directory holds one file per worksheet, named after it
+# (CONGESTION_OCEAN.parquet, CONGESTION_RAIL.csv, ...); a single .xlsx
+# workbook holds them as sheets. Files are read forward as SheetReader pages
+# through them, never whole: CSV line by line, XLSX through openpyxl's
+# read-only mode and Parquet in record batches of a memory-mapped file.
+# Cells are handed over as the strings the Sheets API would return.
+# XLSX needs openpyxl and Parquet needs pyarrow; CSV needs nothing.
+import csv
+import datetime
+import math
+import os
+import re
+import threading
+from itertools import islice
+from sheet_access import column_index, trim_row
+
+EXTENSIONS = ('.parquet', '.csv', '.xlsx')
+PARQUET_BATCH_ROWS = 4096
+
+def cell_text(value):
+    # Formatted value of a typed cell, as the Sheets API would render it
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float):
+        # A float column keeps its decimal point (23.0), so it parses as a float like the sheet's text
+        return '' if math.isnan(value) else repr(value)
+    if isinstance(value, datetime.datetime):
+        if value.time() == datetime.time():
+            return value.date().isoformat()
+        return value.isoformat(sep=' ', timespec='seconds')
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+def csv_rows(path):
+    # utf-8-sig drops the byte order mark spreadsheet tools put in front of the header
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.reader(f)
+
+def xlsx_rows(path, title, first_sheet_fallback=False):
+    # The sheet named title; a per-worksheet file may hold it as its only sheet
+    # under another name, but a workbook source must name every worksheet
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError(f"openpyxl is required to read {path}")
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if title in workbook.sheetnames:
+            worksheet = workbook[title]
+        elif first_sheet_fallback:
+            worksheet = workbook.worksheets[0]
+        else:
+            raise ValueError(f"No sheet named {title} in {path}")
+        for row in worksheet.iter_rows(values_only=True):
+            yield [cell_text(value) for value in row]
+    finally:
+        workbook.close()
+
+def parquet_rows(path):
+    # Column names stand in for the header row
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(f"pyarrow is required to read {path}")
+    parquet = pq.ParquetFile(path, memory_map=True)
+    try:
+        yield list(parquet.schema_arrow.names)
+        for batch in parquet.iter_batches(batch_size=PARQUET_BATCH_ROWS):
+            columns = [column.to_pylist() for column in batch.columns]
+            for row in zip(*columns):
+                yield [cell_text(value) for value in row]
+    finally:
+        parquet.close()
+
+def parse_range(rng):
+    # "'TITLE'!A5:O10" -> (title, first_col, first_row, last_col, last_row); blanks for open ends
+    title, _, cells = rng.partition('!')
+    title = title.strip("'")
+    if not cells:
+        return title, '', 1, '', None
+    match = re.fullmatch(r'([A-Z]*)(\d*):([A-Z]*)(\d*)', cells)
+    if not match:
+        raise ValueError(f"Unsupported range: {rng}")
+    first_col, first_row, last_col, last_row = match.groups()
+    return title, first_col, int(first_row or 1), last_col, int(last_row) if last_row else None
+
+class RowCursor:
+    # One export read forward. Consecutive pages continue where the last one
+    # stopped; asking for an earlier row starts the file over.
+    def __init__(self, open_rows):
+        self._open_rows = open_rows
+        self._rows = None
+        self.next_row = 1
+        self.lock = threading.Lock()
+
+    def read(self, first_row, last_row=None):
+        # Rows first_row..last_row (1-based, inclusive; None reads to the end)
+        if self._rows is None or first_row < self.next_row:
+            self.close()
+            self._rows = self._open_rows()
+            self.next_row = 1
+        try:
+            self.next_row += sum(1 for _ in islice(self._rows, first_row - self.next_row))
+            size = None if last_row is None else max(last_row - first_row + 1, 0)
+            rows = list(islice(self._rows, size))
+        except Exception:
+            # A failed reader is finished; the next read starts the file over
+            self._rows = None
+            raise
+        self.next_row += len(rows)
+        if size is None or len(rows) < size:
+            # End of the file
+            self.close()
+            self.next_row = math.inf
+        return rows
+
+    def close(self):
+        if self._rows is not None:
+            self._rows.close()
+            self._rows = None
+
+class FileSpreadsheet:
+    # source: a directory of per-worksheet exports or one .xlsx workbook
+    # Local reads have no request quota
+    read_quota = 0
+
+    def __init__(self, source):
+        if not os.path.exists(source):
+            raise ValueError(f"Export source not found: {source}")
+        self.source = source
+        self.calls = 0
+        self._cursors = {}
+        self._lock = threading.Lock()
+
+    def export_of(self, title):
+        # (path, row reader) of a worksheet's export
+        if os.path.isfile(self.source):
+            if not self.source.lower().endswith('.xlsx'):
+                raise ValueError(f"Only an .xlsx workbook can hold every worksheet: {self.source}")
+            return self.source, lambda: xlsx_rows(self.source, title)
+        for extension in EXTENSIONS:
+            path = os.path.join(self.source, title + extension)
+            if os.path.isfile(path):
+                if extension == '.csv':
+                    return path, lambda: csv_rows(path)
+                if extension == '.xlsx':
+                    return path, lambda: xlsx_rows(path, title, first_sheet_fallback=True)
+                return path, lambda: parquet_rows(path)
+        raise ValueError(f"No export of {title} in {self.source} (looked for {', '.join(EXTENSIONS)})")
+
+    def cursor(self, title):
+        # Keyed by file and modification time, so a replaced export is read afresh
+        path, open_rows = self.export_of(title)
+        key = (title, path, os.stat(path).st_mtime_ns)
+        with self._lock:
+            cursor = self._cursors.get(key)
+            if cursor is None:
+                for stale in [k for k in self._cursors if k[0] == title]:
+                    self._cursors.pop(stale).close()
+                cursor = self._cursors[key] = RowCursor(open_rows)
+        return cursor
+
+    def read_range(self, rng):
+        # (values, A1 range clipped to the rows the file has), like the API's valueRange
+        title, first_col, first_row, last_col, last_row = parse_range(rng)
+        cursor = self.cursor(title)
+        with cursor.lock:
+            rows = cursor.read(first_row, last_row)
+        if first_col or last_col:
+            first = column_index(first_col) if first_col else 0
+            rows = [row[first:column_index(last_col) + 1] if last_col else row[first:] for row in rows]
+        if last_row is None or len(rows) < last_row - first_row + 1:
+            last_row = first_row + max(len(rows), 1) - 1
+        return rows, f"'{title}'!{first_col or 'A'}{first_row}:{last_col}{last_row}"
+
+    def values_batch_get(self, ranges, params=None):
+        with self._lock:
+            self.calls += 1
+        value_ranges = []
+        for rng in ranges:
+            values, clipped = self.read_range(rng)
+            value_range = {'range': clipped, 'majorDimension': 'ROWS'}
+            # Like the API: trailing empty rows and cells are dropped, empty ranges have no 'values'
+            values = [trim_row(row) for row in values]
+            while values and not values[-1]:
+                values.pop()
+            if values:
+                value_range['values'] = values
+            value_ranges.append(value_range)
+        return {'valueRanges': value_ranges}
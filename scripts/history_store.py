@@ -0,0 +1,157 @@
+# scripts/history_store.py
+# Append-only history of every fetched snapshot, in SQLite (data/.history.sqlite,
+# override with HISTORY_PATH). Each entity (port, airport, rail yard, state) gets
+# a row only when its values change, so hourly runs over unchanged data cost
+# nothing, and a value holds until the next row for that entity. Lookups are
+# clustered primary-key range scans, so writes and queries do not slow down as
+# the history grows.
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from output_format import data_dir, write_output
+
+HISTORY_FILENAME = '.history.sqlite'
+TREND_WINDOW_DAYS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    mode TEXT NOT NULL,
+    taken_at INTEGER NOT NULL,
+    entities INTEGER NOT NULL,
+    changed INTEGER NOT NULL,
+    PRIMARY KEY (mode, taken_at)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS observations (
+    mode TEXT NOT NULL,
+    entity TEXT NOT NULL,
+    taken_at INTEGER NOT NULL,
+    record TEXT,
+    PRIMARY KEY (mode, entity, taken_at)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS observations_by_time ON observations (mode, taken_at);
+CREATE TABLE IF NOT EXISTS latest (
+    mode TEXT NOT NULL,
+    entity TEXT NOT NULL,
+    taken_at INTEGER NOT NULL,
+    record TEXT,
+    PRIMARY KEY (mode, entity)
+) WITHOUT ROWID;
+"""
+
+def encode_record(record):
+    return json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+
+def decode_record(record):
+    # None marks an entity that disappeared from the sheet
+    return json.loads(record) if record is not None else None
+
+def trends_path(output_path):
+    root, ext = os.path.splitext(output_path)
+    return f"{root}.trends{ext}"
+
+class HistoryStore:
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('HISTORY_PATH') or os.path.join(data_dir(), HISTORY_FILENAME)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # One short transaction per call; the fetcher threads never share a connection
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record_snapshot(self, mode, entities, taken_at=None):
+        # entities: entity key -> record. Stores only new, changed and removed
+        # entities and returns how many of each kind there were.
+        taken_at = int(time.time()) if taken_at is None else int(taken_at)
+        encoded = {str(entity): encode_record(record) for entity, record in entities.items()}
+        with self._lock, self._connect() as conn:
+            previous = dict(conn.execute("SELECT entity, record FROM latest WHERE mode = ?", (mode,)))
+            changed = [(entity, record) for entity, record in encoded.items() if previous.get(entity) != record]
+            removed = [(entity, None) for entity, record in previous.items()
+                       if entity not in encoded and record is not None]
+            rows = [(mode, entity, taken_at, record) for entity, record in changed + removed]
+            conn.executemany("INSERT OR REPLACE INTO observations VALUES (?, ?, ?, ?)", rows)
+            conn.executemany("INSERT OR REPLACE INTO latest VALUES (?, ?, ?, ?)", rows)
+            conn.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)",
+                         (mode, taken_at, len(encoded), len(rows)))
+        return len(changed), len(removed)
+
+    def series(self, mode, entity, start=None, end=None):
+        # [(taken_at, record)] for one entity; the value in force at `start` comes first
+        start = 0 if start is None else int(start)
+        end = int(time.time()) if end is None else int(end)
+        with self._connect() as conn:
+            carried = conn.execute(
+                "SELECT taken_at, record FROM observations WHERE mode = ? AND entity = ? AND taken_at < ?"
+                " ORDER BY taken_at DESC LIMIT 1", (mode, str(entity), start)).fetchall()
+            rows = conn.execute(
+                "SELECT taken_at, record FROM observations WHERE mode = ? AND entity = ? AND taken_at BETWEEN ? AND ?"
+                " ORDER BY taken_at", (mode, str(entity), start, end)).fetchall()
+        return [(taken_at, decode_record(record)) for taken_at, record in carried + rows]
+
+    def snapshots(self, mode, start=None, end=None):
+        start = 0 if start is None else int(start)
+        end = int(time.time()) if end is None else int(end)
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT taken_at, entities, changed FROM snapshots WHERE mode = ? AND taken_at BETWEEN ? AND ?"
+                " ORDER BY taken_at", (mode, start, end)).fetchall()
+
+    def trends(self, mode, fields, start, end=None):
+        # entity -> {'times': [...], field: [...]} with one point per change in the window,
+        # starting from the value in force at `start`
+        start = int(start)
+        end = int(time.time()) if end is None else int(end)
+        with self._connect() as conn:
+            entities = [entity for (entity,) in conn.execute(
+                "SELECT entity FROM latest WHERE mode = ? ORDER BY entity", (mode,))]
+            points = {entity: [] for entity in entities}
+            for entity in entities:
+                row = conn.execute(
+                    "SELECT record FROM observations WHERE mode = ? AND entity = ? AND taken_at < ?"
+                    " ORDER BY taken_at DESC LIMIT 1", (mode, entity, start)).fetchone()
+                if row is not None and row[0] is not None:
+                    points[entity].append((start, row[0]))
+            for entity, taken_at, record in conn.execute(
+                    "SELECT entity, taken_at, record FROM observations WHERE mode = ? AND taken_at BETWEEN ? AND ?"
+                    " ORDER BY taken_at", (mode, start, end)):
+                points[entity].append((taken_at, record))
+
+        trends = {}
+        for entity, entity_points in points.items():
+            series = {'times': []}
+            series.update((field, []) for field in fields)
+            for taken_at, record in entity_points:
+                values = decode_record(record) or {}
+                series['times'].append(taken_at)
+                for field in fields:
+                    series[field].append(values.get(field))
+            if series['times']:
+                trends[entity] = series
+        return trends
+
+    def write_trends(self, mode, output_path, fields, window_days=TREND_WINDOW_DAYS):
+        # Writes <output>.trends.json for sparklines: one record per entity
+        # whose history overlaps the last `window_days` days
+        start = int(time.time()) - window_days * 86400
+        records = [{'entity': entity, **series} for entity, series in self.trends(mode, fields, start).items()]
+        write_output(trends_path(output_path), records)
+        return records
+
+    def publish(self, mode, entities, output_path, trend_fields):
+        # Append this run's snapshot and refresh the trend file next to the output
+        changed, removed = self.record_snapshot(mode, entities)
+        self.write_trends(mode, output_path, trend_fields)
+        print(f"🕒 {mode} history: {changed} new or changed, {removed} removed of {len(entities)} entities")
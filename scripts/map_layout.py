@@ -0,0 +1,65 @@
+# scripts/map_layout.py
+# Everything the point maps used to work out on every page load, computed once
+# at publish time and written to <output>.layout.json next to the output:
+#   display - [lat, lng] for each record that shares its exact coordinates with
+#             another, fanned out evenly on a ring around them (always the same
+#             positions, unlike the old Math.random() jitter)
+#   facets  - per filter field, [value, [record indices]] pairs sorted the way
+#             the dropdowns list them
+# Indices are positions in the published record list; count lets the page
+# ignore a layout that belongs to a different version of the data.
+import json
+import math
+import os
+import unicodedata
+from collections import defaultdict
+from cluster_index import is_number
+from output_format import write_payload
+
+def layout_path(output_path):
+    root, ext = os.path.splitext(output_path)
+    return f"{root}.layout{ext}"
+
+def sort_key(value):
+    # Close to the browser's localeCompare: accents and case only break ties
+    folded = ''.join(c for c in unicodedata.normalize('NFKD', value) if not unicodedata.combining(c))
+    return folded.casefold(), value.casefold(), value
+
+def fan_out(points, radius):
+    # points: (lat, lng) per record, None where missing. Returns index -> [lat, lng]
+    # for the records that share a position; the first of a group sits at angle 0.
+    groups = defaultdict(list)
+    for i, point in enumerate(points):
+        if point is not None:
+            groups[point].append(i)
+    display = {}
+    for (lat, lng), indices in groups.items():
+        if len(indices) < 2:
+            continue
+        for position, i in enumerate(indices):
+            angle = position / len(indices) * 2 * math.pi
+            display[i] = [round(lat + math.cos(angle) * radius, 6), round(lng + math.sin(angle) * radius, 6)]
+    return display
+
+def facet_index(records, value_of):
+    # [[value, [indices]]] over the non-blank values, in dropdown order
+    indices = defaultdict(list)
+    for i, record in enumerate(records):
+        value = value_of(record)
+        if isinstance(value, str) and value.strip():
+            indices[value].append(i)
+    return [[value, indices[value]] for value in sorted(indices, key=sort_key)]
+
+def write_layout(output_path, records, coordinates=('lat', 'lng'), radius=0.075, facets=None):
+    # facets: name -> function(record) returning the value to filter on
+    lat_field, lng_field = coordinates
+    points = [(r.get(lat_field), r.get(lng_field)) if is_number(r.get(lat_field)) and is_number(r.get(lng_field))
+              else None for r in records]
+    layout = {
+        'count': len(records),
+        'display': fan_out(points, radius),
+        'facets': {name: facet_index(records, value_of) for name, value_of in (facets or {}).items()},
+    }
+    data = json.dumps(layout, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    write_payload(layout_path(output_path), data, f"layout ({len(layout['display'])} fanned out)")
+    return layout
@@ -0,0 +1,92 @@
+# scripts/metrics.py
+# Per-run stage timings and aggregate counters, in place of per-row log lines.
+# Everything is recorded against the current mode, set per thread by for_mode()
+# (usable as a decorator on a fetcher), so transforms can count skipped rows
+# without being handed a metrics object. fetch_all_data writes the result to
+# data/.metrics.json (or --metrics PATH) at the end of every run.
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+class RunMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self.stages = defaultdict(lambda: defaultdict(float))
+            self.counters = defaultdict(lambda: defaultdict(int))
+
+    @property
+    def mode(self):
+        return getattr(self._local, 'mode', 'run')
+
+    @contextmanager
+    def for_mode(self, mode):
+        previous = self.mode
+        self._local.mode = mode
+        try:
+            yield
+        finally:
+            self._local.mode = previous
+
+    @contextmanager
+    def stage(self, name):
+        # Nested stages are named 'outer.inner' by convention
+        mode = self.mode
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stages[mode][name] += elapsed
+
+    def count(self, name, n=1):
+        if n:
+            mode = self.mode
+            with self._lock:
+                self.counters[mode][name] += int(n)
+
+    def as_dict(self):
+        with self._lock:
+            modes = sorted(set(self.stages) | set(self.counters))
+            return {
+                'started_at': int(self.started_at),
+                'elapsed_seconds': round(time.time() - self.started_at, 3),
+                'modes': {mode: {
+                    'stages': {name: round(seconds, 6) for name, seconds in self.stages[mode].items()},
+                    'counters': dict(sorted(self.counters[mode].items())),
+                } for mode in modes},
+            }
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.as_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def print_summary(self):
+        for mode, data in self.as_dict()['modes'].items():
+            stages = ', '.join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in data['stages'].items())
+            print(f"⏱️ {mode}: {stages or 'no stages'}")
+            if data['counters']:
+                print(f"   {', '.join(f'{name}={value:,}' for name, value in data['counters'].items())}")
+
+RUN_METRICS = RunMetrics()
+
+def for_mode(mode):
+    return RUN_METRICS.for_mode(mode)
+
+def stage(name):
+    return RUN_METRICS.stage(name)
+
+def count(name, n=1):
+    RUN_METRICS.count(name, n)
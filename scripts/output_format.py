@@ -0,0 +1,240 @@
+# scripts/output_format.py
+# Writes the map payloads in the format selected by OUTPUT_FORMAT:
+#   pretty  - indented JSON records, the original layout (default)
+#   compact - minified JSON records without the redundant fields
+#   columns - minified struct of arrays; repeated strings are dictionary-encoded
+# OUTPUT_COMPRESSION=gz,br additionally writes precompressed siblings next to
+# each file (brotli is optional; .br is skipped when it is not installed).
+# js/payload.js turns every layout back into the records the map loaders expect.
+import gzip
+import json
+import os
+import struct
+import zlib
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+OUTPUT_FORMATS = ('pretty', 'compact', 'columns')
+COMPRESSIONS = ('gz', 'br')
+
+def data_dir():
+    # Where every output and the fetch state live; FETCH_DATA_DIR redirects them (e.g. for benchmarks)
+    return os.environ.get('FETCH_DATA_DIR', DEFAULT_DATA_DIR)
+
+def output_settings():
+    fmt = os.environ.get('OUTPUT_FORMAT', 'pretty')
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown OUTPUT_FORMAT: {fmt}")
+    compression = [c for c in os.environ.get('OUTPUT_COMPRESSION', '').replace(' ', '').split(',') if c]
+    for c in compression:
+        if c not in COMPRESSIONS:
+            raise ValueError(f"Unknown OUTPUT_COMPRESSION: {c}")
+    return fmt, compression
+
+def output_signature():
+    # Folded into the worksheet fingerprints so switching formats rewrites every file.
+    fmt, compression = output_settings()
+    return '+'.join([fmt] + compression)
+
+def to_columns(records, drop=(), dictionary=(), key=None):
+    # records is a list of dicts, or a dict of dicts keyed by `key` (truck states).
+    if isinstance(records, dict):
+        records = [{key: k, **v} for k, v in records.items()]
+    fields = []
+    for record in records:
+        for field in record:
+            if field not in drop and field not in fields:
+                fields.append(field)
+
+    columns = {field: [record.get(field) for record in records] for field in fields}
+    dictionaries = {}
+    for field in dictionary:
+        if field not in columns:
+            continue
+        index = {}
+        columns[field] = [index.setdefault(val, len(index)) for val in columns[field]]
+        dictionaries[field] = list(index)
+
+    payload = {'format': 'columns', 'count': len(records), 'columns': columns, 'dictionaries': dictionaries}
+    if key:
+        payload['key'] = key
+    return payload
+
+# Output is encoded and written in pieces of about this size, never as one string
+WRITE_CHUNK_BYTES = 1 << 16
+
+def iter_compact(value, depth):
+    # Minified JSON of value, streamed one container element at a time down to
+    # `depth` levels; deeper values are encoded whole by the C encoder
+    if depth and isinstance(value, dict):
+        yield '{'
+        for i, (k, v) in enumerate(value.items()):
+            yield f"{',' if i else ''}{json.dumps(str(k), ensure_ascii=False)}:"
+            yield from iter_compact(v, depth - 1)
+        yield '}'
+    elif depth and isinstance(value, list):
+        yield '['
+        for i, item in enumerate(value):
+            if i:
+                yield ','
+            yield from iter_compact(item, depth - 1)
+        yield ']'
+    else:
+        yield json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+def encode_chunks(result, fmt, drop=(), dictionary=(), key=None):
+    # The output text in pieces; joined, it is exactly what json.dumps would give
+    if fmt == 'pretty':
+        return json.JSONEncoder(indent=2, ensure_ascii=False).iterencode(result)
+    if fmt == 'columns':
+        # {..., 'columns': {field: [...]}}: one column at a time
+        return iter_compact(to_columns(result, drop, dictionary, key), 2)
+    if isinstance(result, dict):
+        payload = {k: {f: v for f, v in record.items() if f not in drop} for k, record in result.items()}
+    else:
+        payload = [{f: v for f, v in record.items() if f not in drop} for record in result]
+    return iter_compact(payload, 1)
+
+def compress(data, method):
+    if method == 'gz':
+        # mtime=0 keeps the bytes stable for unchanged data
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+class CompressedFile:
+    # Incremental counterpart of compress(): same bytes, written as the data arrives
+    def __init__(self, path, compressor):
+        self._file = open(path, 'wb')
+        self._compressor = compressor
+
+    def write(self, data):
+        self._file.write(self._compressor.process(data))
+
+    def close(self):
+        try:
+            self._file.write(self._compressor.finish())
+        finally:
+            self._file.close()
+
+class GzipCompressor:
+    # brotli.Compressor's process/finish interface for gzip, with the exact
+    # header and deflate settings of gzip.compress(data, 9, mtime=0)
+    HEADER = gzip.compress(b'', compresslevel=9, mtime=0)[:10]
+
+    def __init__(self):
+        self._deflate = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self._crc = 0
+        self._size = 0
+        self._header = self.HEADER
+
+    def process(self, data):
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        out, self._header = self._header + self._deflate.compress(data), b''
+        return out
+
+    def finish(self):
+        return self._header + self._deflate.flush() + struct.pack('<LL', self._crc, self._size & 0xffffffff)
+
+def open_compressed(path, method):
+    # None when the method's library is not installed
+    if method == 'gz':
+        return CompressedFile(path, GzipCompressor())
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return CompressedFile(path, brotli.Compressor(quality=11))
+
+def buffered(chunks, size=WRITE_CHUNK_BYTES):
+    # Joins small text chunks into UTF-8 blocks of about `size` bytes
+    pending, pending_size = [], 0
+    for chunk in chunks:
+        pending.append(chunk)
+        pending_size += len(chunk)
+        if pending_size >= size:
+            yield ''.join(pending).encode('utf-8')
+            pending, pending_size = [], 0
+    if pending:
+        yield ''.join(pending).encode('utf-8')
+
+def write_output(output_path, result, drop=(), dictionary=(), key=None, verbose=True):
+    # drop: fields the map loaders never read (kept only in the pretty layout)
+    # dictionary: low-cardinality string fields to dictionary-encode in the columns layout
+    # key: name of the key field when result is a dict of records
+    fmt, _ = output_settings()
+    write_stream(output_path, buffered(encode_chunks(result, fmt, drop, dictionary, key)), fmt, verbose)
+
+def write_payload(output_path, data, label, verbose=True):
+    # Writes already encoded bytes plus the OUTPUT_COMPRESSION siblings
+    write_stream(output_path, [data], label, verbose)
+
+def write_stream(output_path, blocks, label, verbose=True):
+    # Streams byte blocks into the file and its OUTPUT_COMPRESSION siblings at
+    # once, through .tmp files, so a failure midway leaves the old files in place
+    _, compression = output_settings()
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    targets = {output_path: None}
+    for method in COMPRESSIONS:
+        sibling = f"{output_path}.{method}"
+        if method in compression:
+            targets[sibling] = method
+        elif os.path.exists(sibling):
+            # Never leave a stale sibling that a server would prefer over the new file
+            os.remove(sibling)
+
+    sinks = {}
+    try:
+        for path, method in targets.items():
+            sink = open(f"{path}.tmp", 'wb') if method is None else open_compressed(f"{path}.tmp", method)
+            if sink is None:
+                if verbose:
+                    print(f"⚠️ brotli is not installed, skipping {os.path.basename(path)}")
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            sinks[path] = sink
+        size = 0
+        for block in blocks:
+            size += len(block)
+            for sink in sinks.values():
+                sink.write(block)
+    except BaseException:
+        for path, sink in sinks.items():
+            sink.close()
+            os.remove(f"{path}.tmp")
+        raise
+    for sink in sinks.values():
+        sink.close()
+
+    sizes = [f"{size / 1024:.1f} KB"]
+    for path, sink in sinks.items():
+        os.replace(f"{path}.tmp", path)
+        if targets[path] is not None:
+            sizes.append(f"{targets[path]} {os.path.getsize(path) / 1024:.1f} KB")
+    if verbose:
+        print(f"📝 Wrote {os.path.basename(output_path)} as {label} ({', '.join(sizes)})")
+
+def from_columns(payload):
+    # Inverse of to_columns
+    columns = payload['columns']
+    dictionaries = payload.get('dictionaries', {})
+    decoded = {field: [dictionaries[field][i] for i in values] if field in dictionaries else values
+               for field, values in columns.items()}
+    fields = list(decoded)
+    records = [dict(zip(fields, values)) for values in zip(*decoded.values())] if fields else [{} for _ in range(payload['count'])]
+    key = payload.get('key')
+    if not key:
+        return records
+    return {record.pop(key): record for record in records}
+
+def read_output(output_path):
+    # Reads back any layout written by write_output as plain records
+    with open(output_path, encoding='utf-8') as f:
+        payload = json.load(f)
+    if isinstance(payload, dict) and payload.get('format') == 'columns':
+        return from_columns(payload)
+    return payload
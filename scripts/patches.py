@@ -0,0 +1,116 @@
+# scripts/patches.py
+# Versioned patches between consecutive published snapshots, so a client that
+# already holds version N can move to N+1 without downloading the whole file.
+# Per output (e.g. us-rail.json):
+#   data/patches/us-rail/base.json  - {version, entities: {key: record}}, the latest snapshot keyed by entity
+#   data/patches/us-rail/<N>.json   - patch from N-1 to N: added, removed and changed fields per entity
+#   data/us-rail.version.json       - pointer: current version and the patches still available
+# The pointer is written last, so it never names a patch or base that is not on disk yet.
+import json
+import os
+import time
+from output_format import output_settings, write_payload
+from metrics import count
+
+PATCH_RETENTION = 48
+
+def patch_dir(output_path):
+    name = os.path.splitext(os.path.basename(output_path))[0]
+    return os.path.join(os.path.dirname(output_path), 'patches', name)
+
+def pointer_path(output_path):
+    root, ext = os.path.splitext(output_path)
+    return f"{root}.version{ext}"
+
+def diff_entities(previous, current):
+    added = {key: record for key, record in current.items() if key not in previous}
+    removed = [key for key in previous if key not in current]
+    changed, unset = {}, {}
+    for key, record in current.items():
+        old = previous.get(key)
+        if old is None or old == record:
+            continue
+        fields = {field: value for field, value in record.items() if field not in old or old[field] != value}
+        if fields:
+            changed[key] = fields
+        gone = [field for field in old if field not in record]
+        if gone:
+            unset[key] = gone
+    return added, removed, changed, unset
+
+def key_entities(records, key):
+    # Published records -> {entity key: record} for publish_patch and
+    # HistoryStore.publish. A record whose key an earlier one already took (a
+    # port listed twice, two ports without a code and the same name) is keyed
+    # '<key>#2', '<key>#3', ... in sheet order, so every published record is an
+    # entity and base plus patches rebuilds the published file.
+    entities = {}
+    collisions = 0
+    for record in records:
+        base = entity = str(key(record))
+        n = 1
+        while entity in entities:
+            n += 1
+            entity = f"{base}#{n}"
+        if n > 1:
+            collisions += 1
+        entities[entity] = record
+    if collisions:
+        count('entities.collisions', collisions)
+        print(f"⚠️ {collisions} records share an entity key with an earlier record, keyed with a #N suffix")
+    return entities
+
+def dump(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def publish_patch(output_path, entities, retention=PATCH_RETENTION, drop=()):
+    # entities: entity key -> record as just published, drop: the fields
+    # write_output drops outside the pretty layout. Returns the new version, or
+    # the current one when nothing changed.
+    if output_settings()[0] == 'pretty':
+        drop = ()
+    directory = patch_dir(output_path)
+    base_path = os.path.join(directory, 'base.json')
+    # Round-trip through JSON so the comparison sees what the client sees
+    entities = json.loads(dump({str(key): {field: value for field, value in record.items() if field not in drop}
+                               for key, record in entities.items()}))
+    try:
+        with open(base_path, encoding='utf-8') as f:
+            base = json.load(f)
+    except (OSError, ValueError):
+        base = None
+
+    if base is None:
+        version, patch = 1, None
+    else:
+        added, removed, changed, unset = diff_entities(base['entities'], entities)
+        if not (added or removed or changed or unset):
+            print(f"⏭️ No entity changes for {os.path.basename(output_path)}, staying at version {base['version']}")
+            return base['version']
+        version = base['version'] + 1
+        patch = {'from': base['version'], 'to': version, 'added': added, 'removed': removed, 'changed': changed}
+        if unset:
+            patch['unset'] = unset
+
+    if patch is not None:
+        write_payload(os.path.join(directory, f"{version}.json"), dump(patch), f"patch {patch['from']}->{version}")
+    write_payload(base_path, dump({'version': version, 'entities': entities}), f"base v{version}", verbose=False)
+
+    available = []
+    for filename in os.listdir(directory):
+        stem = filename.split('.', 1)[0]
+        if stem.isdigit():
+            if int(stem) <= version - retention:
+                os.remove(os.path.join(directory, filename))
+            elif filename == f"{stem}.json":
+                available.append(int(stem))
+
+    pointer = {
+        'version': version,
+        'updated_at': int(time.time()),
+        'base': os.path.relpath(base_path, os.path.dirname(output_path)).replace(os.sep, '/'),
+        # A client at version N can apply patches N+1 .. version if N+1 is listed
+        'patches': sorted(available),
+    }
+    write_payload(pointer_path(output_path), dump(pointer), f"version {version}", verbose=False)
+    return version
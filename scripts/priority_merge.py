@@ -0,0 +1,64 @@
+# scripts/priority_merge.py
+from collections import Counter, namedtuple
+
+# One source-priority rule. A row belongs to the first rule whose source matches and
+# whose company set contains the row's company (None matches any company).
+# alias renames the company for display and keying; keep decides which row wins
+# when two rows of the same rank share a key ('first' or 'last').
+PriorityRule = namedtuple('PriorityRule', ['source', 'companies', 'alias', 'keep'],
+                          defaults=[None, None, 'first'])
+
+def tier_name(rule):
+    # Label for per-tier counters, e.g. 'CONGESTION_RAIL2/CP+KCS' or 'CONGESTION_RAIL/*'
+    return f"{rule.source}/{'+'.join(sorted(rule.companies)) if rule.companies else '*'}"
+
+class PriorityMerge:
+    # Single-pass replacement for "scan each tier in turn, first writer wins":
+    # every row is offered once with its rank, and conflicts are settled by rank.
+    def __init__(self, rules):
+        self.rules = rules
+        self._rule_cache = {}
+        self._entries = {}
+        self._seq = 0
+        # rank -> rows that lost their key, whether rejected up front or displaced later
+        self.dropped = Counter()
+
+    def rule_for(self, source, company):
+        # Returns (rank, rule), or (None, None) if no rule claims the row.
+        cache_key = (source, company)
+        if cache_key not in self._rule_cache:
+            self._rule_cache[cache_key] = next(
+                ((rank, rule) for rank, rule in enumerate(self.rules)
+                 if rule.source == source and (rule.companies is None or company in rule.companies)),
+                (None, None)
+            )
+        return self._rule_cache[cache_key]
+
+    def accepts(self, rank, key):
+        # False when a higher-priority (or earlier same-rank) row already owns the key.
+        entry = self._entries.get(key)
+        return entry is None or rank < entry[0] or (rank == entry[0] and self.rules[rank].keep == 'last')
+
+    def offer(self, rank, key, record):
+        # Stores the record if it wins the key; returns whether it did.
+        entry = self._entries.get(key)
+        if entry is None or rank < entry[0]:
+            if entry is not None:
+                self.dropped[entry[0]] += 1
+            self._entries[key] = [rank, self._seq, record]
+            self._seq += 1
+            return True
+        if rank == entry[0] and self.rules[rank].keep == 'last':
+            self.dropped[rank] += 1
+            entry[2] = record
+            return True
+        self.dropped[rank] += 1
+        return False
+
+    def reject(self, rank):
+        # For callers that check accepts() first and never offer the losing row
+        self.dropped[rank] += 1
+
+    def results(self):
+        # Same order the tier-by-tier passes produced: by rank, then first appearance.
+        return [entry[2] for entry in sorted(self._entries.values(), key=lambda entry: (entry[0], entry[1]))]
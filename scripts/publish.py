@@ -0,0 +1,75 @@
+# scripts/publish.py
+# The run every fetcher shares, driven by its Publication: the worksheets
+# stream in a page at a time (the first page of each in one batch request) and
+# are fingerprinted and spooled on the way, so no sheet is ever held whole and
+# nothing is transformed unless one of them changed. A changed mode is then
+# transformed from the spooled rows and published (payload, summary, history,
+# patches), and its fingerprints are committed last, so a run that fails half
+# way is redone next time.
+import os
+from collections import namedtuple
+from sheets import open_spreadsheet
+from sheet_access import SheetReader
+from output_format import data_dir
+from summary import write_summary
+from history_store import HistoryStore
+from patches import publish_patch
+from change_detection import FingerprintStore, RowFingerprint
+from metrics import count, stage
+
+# mode: name for fingerprints, history and metrics; filename: payload in the data dir
+# sources: [(worksheet title, range)], the keys transform gets its rows under
+# version: () -> transform version folded into the fingerprints
+# transform: {title: rows} -> result; write: (output_path, result) writes the payload and its siblings
+# rollups: for write_summary; entities: result -> {entity key: record}, see key_entities
+# records: result -> record list for the summary (default: result itself)
+# drop: the fields write_output drops, left out of the patches the same way
+Publication = namedtuple('Publication', ['mode', 'filename', 'sources', 'version', 'transform', 'write',
+                                         'rollups', 'entities', 'trend_fields', 'records', 'drop'],
+                         defaults=[None, ()])
+
+def publish(publication, reader=None, fingerprints=None, history=None):
+    # Returns (output_path, result); result is None when no worksheet changed
+    if reader is None:
+        reader = SheetReader(open_spreadsheet())
+    if fingerprints is None:
+        fingerprints = FingerprintStore()
+    if history is None:
+        history = HistoryStore()
+
+    mode = publication.mode
+    output_path = os.path.join(data_dir(), publication.filename)
+    ranges = [rng for _, rng in publication.sources]
+
+    # A no-op when the runner already fetched the first pages of every mode
+    reader.prefetch_pages(ranges)
+    trackers = {rng: RowFingerprint(publication.version()) for rng in ranges}
+    with stage('fetch'):
+        for rng, tracker in trackers.items():
+            tracker.consume(reader.rows(rng))
+    current = {rng: tracker.hexdigest() for rng, tracker in trackers.items()}
+    if fingerprints.is_unchanged(mode, current, output_path):
+        print(f"⏭️ {' and '.join(title for title, _ in publication.sources)} unchanged, keeping {output_path}")
+        return output_path, None
+
+    with stage('transform'):
+        result = publication.transform({title: trackers[rng].replay() for title, rng in publication.sources})
+
+    for title, rng in publication.sources:
+        rows = max(trackers[rng].rows - 1, 0)
+        print(f"📝 Number of records fetched from {title}: {rows}")
+        count('rows_in', rows)
+    count('records_out', len(result))
+
+    with stage('write'):
+        publication.write(output_path, result)
+    with stage('summary'):
+        write_summary(output_path, publication.records(result) if publication.records else result,
+                      publication.rollups)
+    entities = publication.entities(result)
+    with stage('history'):
+        history.publish(mode, entities, output_path, publication.trend_fields)
+    with stage('patches'):
+        publish_patch(output_path, entities, drop=publication.drop)
+    fingerprints.commit(mode, current)
+    return output_path, result
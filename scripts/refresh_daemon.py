@@ -0,0 +1,336 @@
+# scripts/refresh_daemon.py
+# Long-running alternative to the scheduled deploy: polls every worksheet on
+# its own interval, runs the usual fetcher (which skips unchanged sheets), and
+# serves the site and the latest payloads from a built-in asyncio HTTP server.
+#
+#   python scripts/refresh_daemon.py --port 8000 --interval 60 --interval rail=30
+#   python scripts/refresh_daemon.py --fake 2000      # synthetic sheets, no credentials
+#   python scripts/refresh_daemon.py --source exports/  # local CSV/XLSX/Parquet exports
+#
+# Responses carry strong ETags (If-None-Match answers 304) and are sent gzip
+# or brotli encoded when the client accepts it, from the precompressed
+# siblings when OUTPUT_COMPRESSION wrote them. Payloads are kept in memory and
+# reloaded when the file on disk changes. GET /_status reports the last
+# refresh of every mode and the run metrics.
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import mimetypes
+import os
+import signal
+import sys
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import unquote, urlsplit
+from sheets import open_spreadsheet
+from sheet_access import SheetReader
+from request_scheduler import RequestScheduler
+from change_detection import FingerprintStore
+from history_store import HistoryStore
+from cluster_index import build_cluster_indexes
+from metrics import RUN_METRICS
+from output_format import COMPRESSIONS, compress, data_dir
+from fetch_all_data import FETCHERS
+
+SITE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_INTERVAL_SECONDS = 60
+KEEP_ALIVE_SECONDS = 15
+MAX_HEADER_LINES = 100
+# Content-Encoding token for each OUTPUT_COMPRESSION sibling, in order of preference
+ENCODINGS = {'br': 'br', 'gz': 'gzip'}
+
+# One cached file: its bytes per content coding, and the identity ETag they derive from
+Payload = namedtuple('Payload', ['stamp', 'content_type', 'etag', 'bodies'])
+
+class PayloadCache:
+    # path -> Payload, reloaded whenever the file's size or mtime changes
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        # None if the file does not exist. Blocking: call it off the event loop.
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._entries.pop(path, None)
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None and entry.stamp == stamp:
+            return entry
+        entry = self.load(path, stat, stamp)
+        with self._lock:
+            self._entries[path] = entry
+        return entry
+
+    def load(self, path, stat, stamp):
+        with open(path, 'rb') as f:
+            body = f.read()
+        bodies = {'identity': body}
+        for method in COMPRESSIONS:
+            sibling = f"{path}.{method}"
+            # A sibling older than the file belongs to a previous version
+            if os.path.exists(sibling) and os.stat(sibling).st_mtime_ns >= stat.st_mtime_ns:
+                with open(sibling, 'rb') as f:
+                    bodies[ENCODINGS[method]] = f.read()
+            elif len(body) > 1024:
+                packed = compress(body, method)
+                if packed is not None:
+                    bodies[ENCODINGS[method]] = packed
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/json', 'application/javascript'):
+            content_type += '; charset=utf-8'
+        return Payload(stamp, content_type, hashlib.sha256(body).hexdigest()[:32], bodies)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+def accepted_encodings(header):
+    # {coding: q} from an Accept-Encoding header
+    accepted = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+def choose_encoding(payload, header):
+    # Best coding the client accepts and we have; identity unless explicitly refused
+    accepted = accepted_encodings(header)
+    for coding in ('br', 'gzip'):
+        if coding in payload.bodies and accepted.get(coding, accepted.get('*', 0)) > 0:
+            return coding
+    return 'identity'
+
+def etag_for(payload, coding):
+    # Strong validators differ per representation, so each coding gets its own
+    return f'"{payload.etag}"' if coding == 'identity' else f'"{payload.etag}-{coding}"'
+
+def etag_matches(header, etag):
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored
+    if header is None:
+        return False
+    if header.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in header.split(','))
+
+def resolve_path(target):
+    # URL path -> file under the site root or the data dir; None for anything
+    # hidden (fetch state, history, .git) or outside them
+    parts = [part for part in unquote(urlsplit(target).path).split('/') if part]
+    if any(part.startswith('.') or '\\' in part for part in parts):
+        return None
+    if not parts:
+        parts = ['index.html']
+    if parts[0] == 'data':
+        return os.path.join(data_dir(), *parts[1:])
+    if parts[0] not in ('index.html', 'js', 'styles'):
+        return None
+    return os.path.join(SITE_ROOT, *parts)
+
+class RefreshDaemon:
+    def __init__(self, sheet, modes, intervals, scheduler=None):
+        self.sheet = sheet
+        self.modes = modes
+        self.intervals = intervals
+        # One quota for every mode; a poll that keeps failing gives up after
+        # its retries rather than at a run deadline
+        self.scheduler = scheduler or RequestScheduler(quota_per_minute=getattr(sheet, 'read_quota', None),
+                                                       deadline_seconds=math.inf)
+        self.fingerprints = FingerprintStore()
+        self.history = HistoryStore()
+        self.cache = PayloadCache()
+        self.started_at = time.time()
+        self.status = {mode: {'last_run': None, 'ok': None, 'changed': None, 'seconds': None} for mode in modes}
+
+    def refresh(self, mode):
+        # One poll of one mode, on a worker thread
+        start = time.perf_counter()
+        self.fingerprints.changed.pop(mode, None)
+        # A fresh reader per poll: readers cache what they read
+        reader = SheetReader(self.sheet, scheduler=self.scheduler)
+        ok = FETCHERS[mode](reader, self.fingerprints, self.history)
+        changed = bool(self.fingerprints.changed.get(mode))
+        if ok:
+            ok = all(build_cluster_indexes([mode], self.fingerprints.changed).values())
+        self.status[mode] = {'last_run': int(time.time()), 'ok': ok, 'changed': changed,
+                             'seconds': round(time.perf_counter() - start, 3)}
+        return ok, changed
+
+    async def poll(self, mode, stop):
+        loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            started = loop.time()
+            try:
+                ok, changed = await loop.run_in_executor(None, self.refresh, mode)
+                print(f"{'✅' if ok else '❌'} {mode} refreshed ({'changed' if changed else 'unchanged' if ok else 'failed'})")
+            except Exception as e:
+                print(f"❌ Refreshing {mode} failed: {str(e)}")
+            try:
+                await asyncio.wait_for(stop.wait(), max(self.intervals[mode] - (loop.time() - started), 0))
+            except asyncio.TimeoutError:
+                pass
+
+    def status_payload(self):
+        body = json.dumps({
+            'started_at': int(self.started_at),
+            'modes': self.status,
+            'cached_files': len(self.cache),
+            'metrics': RUN_METRICS.as_dict()['modes'],
+        }, indent=2).encode('utf-8')
+        return Payload(None, 'application/json; charset=utf-8', hashlib.sha256(body).hexdigest()[:32],
+                       {'identity': body})
+
+    async def respond(self, method, target, headers):
+        # (status, headers, body) for one request
+        if method not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD'}, b''
+        if urlsplit(target).path == '/_status':
+            payload = self.status_payload()
+        else:
+            path = resolve_path(target)
+            payload = None
+            if path is not None and os.path.isfile(path):
+                payload = await asyncio.get_running_loop().run_in_executor(None, self.cache.get, path)
+            if payload is None:
+                return 404, {'Content-Type': 'text/plain; charset=utf-8'}, b'Not found\n'
+
+        coding = choose_encoding(payload, headers.get('accept-encoding'))
+        etag = etag_for(payload, coding)
+        response_headers = {'ETag': etag, 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+        if etag_matches(headers.get('if-none-match'), etag):
+            return 304, response_headers, b''
+        response_headers['Content-Type'] = payload.content_type
+        if coding != 'identity':
+            response_headers['Content-Encoding'] = coding
+        return 200, response_headers, payload.bodies[coding]
+
+    async def handle(self, reader, writer):
+        # One client connection; HTTP/1.1 keep-alive, requests answered in order
+        try:
+            while True:
+                line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_SECONDS)
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode('latin-1').split()
+                except ValueError:
+                    await self.send(writer, 400, {}, b'Bad request\n', False)
+                    break
+                headers = {}
+                for _ in range(MAX_HEADER_LINES):
+                    header = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_SECONDS)
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                else:
+                    await self.send(writer, 431, {}, b'Too many headers\n', False)
+                    break
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                # GET and HEAD carry no body; anything else is refused and the connection closed
+                if 'content-length' in headers or 'transfer-encoding' in headers:
+                    keep_alive = False
+                try:
+                    status, response_headers, body = await self.respond(method, target, headers)
+                except Exception as e:
+                    print(f"❌ Error serving {target}: {str(e)}")
+                    status, response_headers, body = 500, {}, b'Internal server error\n'
+                await self.send(writer, status, response_headers, body, keep_alive, method == 'HEAD')
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def send(self, writer, status, headers, body, keep_alive, head_only=False):
+        reason = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+                  405: 'Method Not Allowed', 431: 'Request Header Fields Too Large',
+                  500: 'Internal Server Error'}[status]
+        lines = [f"HTTP/1.1 {status} {reason}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        if status != 304:
+            lines.append(f"Content-Length: {len(body)}")
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if not head_only and status != 304:
+            writer.write(body)
+        await writer.drain()
+
+    async def run(self, host, port):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        server = await asyncio.start_server(self.handle, host, port)
+        address = server.sockets[0].getsockname()
+        print(f"🔵 Serving {SITE_ROOT} and {data_dir()} on http://{address[0]}:{address[1]}/")
+        polls = [asyncio.create_task(self.poll(mode, stop)) for mode in self.modes]
+        async with server:
+            await stop.wait()
+        print("🔵 Shutting down")
+        await asyncio.gather(*polls, return_exceptions=True)
+
+def parse_intervals(values, modes):
+    # ['60', 'rail=30'] -> {mode: seconds}; a bare number sets every mode
+    intervals = dict.fromkeys(modes, float(DEFAULT_INTERVAL_SECONDS))
+    for value in values or []:
+        mode, _, seconds = value.rpartition('=')
+        if mode and mode not in intervals:
+            raise ValueError(f"Unknown mode in --interval: {mode}")
+        for name in [mode] if mode else modes:
+            intervals[name] = float(seconds)
+    return intervals
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Poll the congestion sheets and serve the map with fresh data.")
+    parser.add_argument('modes', nargs='*', metavar='MODE', help=f"modes to refresh ({', '.join(FETCHERS)}); defaults to all")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--interval', action='append', metavar='[MODE=]SECONDS',
+                        help=f"poll interval, for every mode or one (default {DEFAULT_INTERVAL_SECONDS}s); repeatable")
+    parser.add_argument('--source', metavar='PATH',
+                        help="poll local exports (a directory or .xlsx workbook) instead of Google Sheets")
+    parser.add_argument('--fake', type=int, metavar='ROWS', help="serve synthetic sheets of ROWS rows instead of Google Sheets")
+    args = parser.parse_args(argv)
+    modes = args.modes or list(FETCHERS)
+    unknown = [mode for mode in modes if mode not in FETCHERS]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+    try:
+        intervals = parse_intervals(args.interval, modes)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.fake:
+        from fake_sheets import FakeSpreadsheet, generate_workbook
+        sheet = FakeSpreadsheet(generate_workbook(args.fake))
+    else:
+        sheet = open_spreadsheet(args.source)
+    asyncio.run(RefreshDaemon(sheet, modes, intervals).run(args.host, args.port))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
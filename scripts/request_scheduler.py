@@ -0,0 +1,143 @@
+# scripts/request_scheduler.py
+# Every Sheets API read of a run goes through one RequestScheduler, shared by
+# all fetchers through their SheetReader:
+#   - a token bucket sized to the read quota (SHEETS_READ_QUOTA requests per
+#     minute, 0 for no limit), so concurrent fetchers never outrun it
+#   - requests waiting for a token are served by mode priority, then in order
+#   - 429, 5xx and connection errors are retried with exponential backoff and
+#     jitter (or the server's Retry-After), instead of failing the mode
+#   - nothing waits or retries past the run deadline (FETCH_DEADLINE_SECONDS)
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from metrics import RUN_METRICS, count
+
+# Sheets API default: 60 read requests per minute per user per project
+READ_QUOTA_PER_MINUTE = 60
+# The bucket holds this many seconds' worth of quota and refills at the rest,
+# so no sliding minute ever sees more than the quota
+BURST_SECONDS = 10
+DEADLINE_SECONDS = 900
+# Longest single wait for a token; waiters re-check on wake-up anyway, and an
+# infinite deadline (the refresh daemon) must not reach Condition.wait()
+MAX_WAIT_SECONDS = 60
+# Backoff sums to about a minute before the last attempt, long enough for a spent quota window to reopen
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_CAP_SECONDS = 32.0
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Lower goes first when requests queue for tokens: the runner's batched first
+# pages, then the small sheets, then the large ones
+MODE_PRIORITY = {'run': 0, 'truck': 1, 'air': 2, 'ocean': 3, 'rail': 4}
+
+class DeadlineExceeded(RuntimeError):
+    pass
+
+def status_of(error):
+    # HTTP status of a gspread APIError (or anything shaped like one)
+    return getattr(getattr(error, 'response', None), 'status_code', None)
+
+def is_retryable(error):
+    status = status_of(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # requests' ConnectionError and Timeout are OSErrors too
+    return isinstance(error, OSError)
+
+def retry_after(error):
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return max(float(headers.get('Retry-After')), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def backoff(attempt):
+    # Equal jitter: at least half the exponential delay, so retries spread out but never hammer
+    delay = min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+class RequestScheduler:
+    def __init__(self, quota_per_minute=None, deadline_seconds=None, max_attempts=MAX_ATTEMPTS):
+        if quota_per_minute is None:
+            quota_per_minute = float(os.environ.get('SHEETS_READ_QUOTA') or READ_QUOTA_PER_MINUTE)
+        if deadline_seconds is None:
+            deadline_seconds = float(os.environ.get('FETCH_DEADLINE_SECONDS') or DEADLINE_SECONDS)
+        self.quota_per_minute = quota_per_minute
+        self.deadline = time.monotonic() + deadline_seconds
+        self.max_attempts = max_attempts
+        self.capacity = max(quota_per_minute * BURST_SECONDS / 60, 1.0)
+        self.rate = max(quota_per_minute - self.capacity, 1.0) / 60
+        self._tokens = self.capacity
+        self._refilled_at = time.monotonic()
+        self._waiting = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def acquire(self, priority):
+        # Blocks until this request is first in line and a token is free
+        if not self.quota_per_minute:
+            return
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    self._refill()
+                    first = self._waiting[0] == ticket
+                    if first and self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    remaining = self.remaining()
+                    if remaining <= 0:
+                        raise DeadlineExceeded("Run deadline reached while waiting for Sheets API quota")
+                    wait = min(remaining, MAX_WAIT_SECONDS)
+                    if first:
+                        wait = min(wait, (1 - self._tokens) / self.rate)
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def throttled(self):
+        # A 429 means the quota window is spent: stop everyone, not just the caller
+        with self._cond:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0)
+
+    def call(self, request, mode=None):
+        # Runs request() under the quota, retrying transient failures. Counters
+        # land on `mode`, which also decides the queue priority.
+        mode = mode or RUN_METRICS.mode
+        priority = MODE_PRIORITY.get(mode, len(MODE_PRIORITY))
+        with RUN_METRICS.for_mode(mode):
+            for attempt in itertools.count(1):
+                self.acquire(priority)
+                count('api_requests')
+                try:
+                    return request()
+                except Exception as e:
+                    if not is_retryable(e) or attempt >= self.max_attempts:
+                        raise
+                    status = status_of(e)
+                    if status == 429:
+                        self.throttled()
+                    delay = retry_after(e)
+                    delay = backoff(attempt) if delay is None else delay
+                    if delay >= self.remaining():
+                        raise DeadlineExceeded(f"Run deadline reached after {attempt} attempts: {str(e)}") from e
+                    count('api_retries')
+                    print(f"🔄 Sheets API {status or type(e).__name__} for {mode}, retry {attempt} in {delay:.1f}s")
+                    time.sleep(delay)
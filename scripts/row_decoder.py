@@ -0,0 +1,77 @@
+# scripts/row_decoder.py
+import math
+from metrics import count
+
+# Cell values treated as "no value" by every mode
+BLANK_VALUES = {"", "N/A", "NaN"}
+
+def number(val, default=None):
+    # Whole numbers stay int, anything with a decimal point becomes float.
+    # Thousands separators are ignored.
+    if val is None:
+        return default
+    val = str(val).replace(",", "").strip()
+    if val in BLANK_VALUES:
+        return default
+    try:
+        result = float(val) if "." in val else int(val)
+    except ValueError:
+        return default
+    return result if math.isfinite(result) else default
+
+def decimal(val, default=None):
+    # Always a float; used where coordinates and durations must not come out as int.
+    result = number(val, default)
+    return float(result) if isinstance(result, int) else result
+
+def text(val):
+    return "" if val is None else str(val).strip()
+
+def lower_text(val):
+    return text(val).lower()
+
+class RowDecoder:
+    # A mode's schema is a list of (field, column, converter). Compiling it against
+    # the header row once turns every data row into a value list with plain index
+    # lookups, instead of building a dict per row and calling row.get() per field.
+    # Short rows are padded with ""; columns missing from the sheet decode as converter(None).
+    def __init__(self, schema, headers):
+        positions = {}
+        for i, header in enumerate(headers):
+            positions.setdefault(header, i)
+
+        self._width = max(len(headers), 1)
+        self._padding = [""] * self._width
+        self.fields = tuple(field for field, _, _ in schema)
+        self._plan = tuple(
+            (positions[column], converter) if column in positions
+            else (0, lambda _, converter=converter: converter(None))
+            for _, column, converter in schema
+        )
+
+    def decode(self, row):
+        if len(row) < self._width:
+            row = row + self._padding[len(row):]
+        return [converter(row[index]) for index, converter in self._plan]
+
+    def decode_record(self, row):
+        return dict(zip(self.fields, self.decode(row)))
+
+    def decode_rows(self, rows, decode=None):
+        # Every row through decode (default: self.decode), as a list. Rows that
+        # fail are left out and counted under skipped.error, with one line
+        # naming the first of them rather than one line each.
+        decode = decode or self.decode
+        decoded = []
+        failures, first_failure = 0, None
+        for row in rows:
+            try:
+                decoded.append(decode(row))
+            except Exception as e:
+                failures += 1
+                if first_failure is None:
+                    first_failure = f"{row}: {str(e)}"
+        if failures:
+            count('skipped.error', failures)
+            print(f"⚠️ {failures} rows could not be decoded, first {first_failure}")
+        return decoded
@@ -0,0 +1,147 @@
+# scripts/sheet_access.py
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from metrics import RUN_METRICS, count, stage
+from request_scheduler import RequestScheduler
+
+# Rows per paged request; override with SHEET_PAGE_ROWS
+PAGE_ROWS = 5000
+
+def worksheet_range(title, cells=None):
+    # A bare quoted title asks the Sheets API for the whole used range.
+    # Column-only cells (e.g. 'A:O') are read in pages like a bare title.
+    return f"'{title}'!{cells}" if cells else f"'{title}'"
+
+def page_rows():
+    return max(int(os.environ.get('SHEET_PAGE_ROWS') or PAGE_ROWS), 1)
+
+def page_range(rng, first_row, last_row):
+    # The same worksheet (and column span) limited to rows first_row..last_row
+    title, _, cells = rng.partition('!')
+    if not cells:
+        return f"{title}!{first_row}:{last_row}"
+    match = re.fullmatch(r'([A-Z]+):([A-Z]+)', cells)
+    if not match:
+        raise ValueError(f"Only whole worksheets or column spans can be paged: {rng}")
+    first_col, last_col = match.groups()
+    return f"{title}!{first_col}{first_row}:{last_col}{last_row}"
+
+def column_index(letters):
+    # 0-based index of an A1 column ('A' -> 0, 'AA' -> 26)
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+def trim_row(row):
+    # Trailing empty cells dropped, as the API returns rows
+    row = list(row)
+    while row and row[-1] == '':
+        row.pop()
+    return row
+
+def last_row_of(value_range):
+    # The API clips the reported range to the worksheet grid, so a page that
+    # ends early has reached the bottom of the sheet
+    match = re.search(r'(\d+)$', value_range.get('range', ''))
+    return int(match.group(1)) if match else None
+
+def split_header(values):
+    # (header row, data rows) of a fetched range; data rows stay lazy for a stream
+    if isinstance(values, list):
+        if not values:
+            return [], []
+        return values[0], values[1:]
+    rows = iter(values)
+    return next(rows, []), rows
+
+def require_headers(headers, expected_headers):
+    for header in expected_headers:
+        if headers.count(header) != 1:
+            raise ValueError(f"Expected header '{header}' exactly once, found {headers.count(header)}")
+
+class SheetReader:
+    # Serves worksheet ranges out of as few values_batch_get calls as possible.
+    # get() returns a whole range at once; rows() streams a worksheet in pages
+    # of page_rows rows, fetching the next page while the caller works through
+    # the current one. The runner fetches the first page of every mode's
+    # worksheets in one request, which is all a sheet smaller than a page needs.
+    # Every API call goes through the scheduler, shared by whoever shares the reader.
+    # A sheet with a read_quota attribute (local exports have none) sets its quota.
+    def __init__(self, sheet, rows_per_page=None, scheduler=None):
+        self.sheet = sheet
+        self.rows_per_page = rows_per_page or page_rows()
+        self.scheduler = scheduler or RequestScheduler(quota_per_minute=getattr(sheet, 'read_quota', None))
+        self._values = {}
+        self._first_pages = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, ranges):
+        with self._lock:
+            missing = [r for r in dict.fromkeys(ranges) if r not in self._values]
+            if not missing:
+                return
+            response = self._batch_get(missing)
+            for rng, value_range in zip(missing, response.get('valueRanges', [])):
+                # Empty ranges come back without a 'values' key.
+                self._values[rng] = value_range.get('values', [])
+
+    def get(self, rng):
+        self.prefetch([rng])
+        return self._values[rng]
+
+    def _batch_get(self, ranges, mode=None):
+        return self.scheduler.call(lambda: self.sheet.values_batch_get(ranges), mode)
+
+    def _read_pages(self, requests, mode=None):
+        # requests: [(range, first_row)] -> [(values, at_end)], in one API call
+        ranges = [page_range(rng, first_row, first_row + self.rows_per_page - 1) for rng, first_row in requests]
+        response = self._batch_get(ranges, mode)
+        pages = []
+        for (rng, first_row), value_range in zip(requests, response.get('valueRanges', [])):
+            values = value_range.get('values', [])
+            last_row = last_row_of(value_range)
+            clipped = last_row is not None and last_row < first_row + self.rows_per_page - 1
+            pages.append((values, not values or clipped))
+        return pages
+
+    def prefetch_pages(self, ranges):
+        # First page of every range in a single request
+        with self._lock:
+            missing = [r for r in dict.fromkeys(ranges) if r not in self._values and r not in self._first_pages]
+            if missing:
+                for rng, page in zip(missing, self._read_pages([(rng, 1) for rng in missing])):
+                    self._first_pages[rng] = page
+
+    def rows(self, rng):
+        # Header row first, then every data row, like get(rng) but a page at a time.
+        # Reading stops at the bottom of the grid or at the first page with no values.
+        if rng in self._values:
+            yield from self._values[rng]
+            return
+        with self._lock:
+            page = self._first_pages.pop(rng, None)
+        if page is None:
+            page = self._read_pages([(rng, 1)])[0]
+        # Pages are fetched on a helper thread, which does not know the fetcher's mode
+        mode = RUN_METRICS.mode
+
+        first_row = 1
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            while True:
+                values, at_end = page
+                count('sheet_pages')
+                if at_end:
+                    yield from values
+                    return
+                next_page = pool.submit(self._read_pages, [(rng, first_row + self.rows_per_page)], mode)
+                yield from values
+                with stage('fetch.wait'):
+                    page = next_page.result()[0]
+                if page[0]:
+                    # Blank rows at the end of a page are trimmed by the API; put
+                    # them back since more data follows
+                    yield from ([] for _ in range(self.rows_per_page - len(values)))
+                first_row += self.rows_per_page
@@ -0,0 +1,29 @@
+# scripts/sheets.py
+import os
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+
+def open_spreadsheet(source=None):
+    # Local exports (a directory or .xlsx workbook, see file_sheets) when a
+    # source is given or FETCH_SOURCE is set, the live spreadsheet otherwise.
+    source = source or os.environ.get('FETCH_SOURCE')
+    if source:
+        from file_sheets import FileSpreadsheet
+        print(f"📂 Reading worksheets from: {source}")
+        return FileSpreadsheet(source)
+
+    # gspread/google-auth are imported here so the fetchers can be driven by a
+    # local stand-in spreadsheet without the Google client libraries installed.
+    import gspread
+    from google.oauth2 import service_account
+
+    creds_dict = eval(os.environ['GOOGLE_CREDENTIAL_JSON'])
+    creds = service_account.Credentials.from_service_account_info(
+        creds_dict,
+        scopes=SCOPES
+    )
+    gc = gspread.authorize(creds)
+    print("✅ Google Authentication Successful")
+
+    spreadsheet_id = os.environ['SPREADSHEET_ID']
+    return gc.open_by_key(spreadsheet_id)
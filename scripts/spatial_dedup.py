@@ -0,0 +1,93 @@
+# scripts/spatial_dedup.py
+# One-pass near-duplicate removal for points. Kept points are bucketed in a
+# grid spatial hash whose cells are `radius` meters on a side. A new point is
+# only compared with kept points in the cells around its own. Those
+# candidates must also be in the same group and have a similar name. That
+# makes the pass O(n) for any realistic density, where a pairwise scan would
+# be O(n^2). Longitude cells widen with latitude, so a cell is never narrower
+# than the radius. Points across the antimeridian are not matched, which is
+# fine for the US networks this is used for.
+import math
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+# Cells are at most this close to the poles, so their width stays finite
+MAX_LATITUDE = 89.0
+
+def distance_m(lat1, lng1, lat2, lng2):
+    # Haversine distance in meters
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+DIGITS_PATTERN = re.compile(r'\d+')
+
+def name_similarity(a, b):
+    # 0..1; quick_ratio is an upper bound that skips most full comparisons.
+    # Names with different numbers in them ('YARD_1', 'YARD_2') never match.
+    if a == b:
+        return 1.0
+    if DIGITS_PATTERN.findall(a) != DIGITS_PATTERN.findall(b):
+        return 0.0
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    return matcher.ratio() if matcher.quick_ratio() else 0.0
+
+class SpatialHash:
+    def __init__(self, radius_m):
+        self.radius_m = radius_m
+        self.cell_deg = radius_m / METERS_PER_DEGREE
+        self.cells = defaultdict(list)
+
+    def row_of(self, lat):
+        return math.floor(lat / self.cell_deg)
+
+    def width_at(self, latitude):
+        # Longitude degrees spanning radius_m at this latitude
+        return self.cell_deg / math.cos(math.radians(min(abs(latitude), MAX_LATITUDE)))
+
+    def cell_width(self, row):
+        # Measured at the poleward edge of the row, the narrowest point of its cells
+        return self.width_at(max(abs(row * self.cell_deg), abs((row + 1) * self.cell_deg)))
+
+    def add(self, lat, lng, item):
+        row = self.row_of(lat)
+        self.cells[(row, math.floor(lng / self.cell_width(row)))].append((lat, lng, item))
+
+    def near(self, lat, lng):
+        # Every stored (lat, lng, item) that may lie within radius_m; callers check the distance
+        row = self.row_of(lat)
+        # Widest longitude span a neighbour can be off by, anywhere in the three rows
+        span = max(self.cell_width(r) for r in (row - 1, row, row + 1))
+        for r in (row - 1, row, row + 1):
+            width = self.cell_width(r)
+            for column in range(math.floor((lng - span) / width), math.floor((lng + span) / width) + 1):
+                yield from self.cells.get((r, column), ())
+
+def proximity_dedup(records, radius_m, min_similarity, point, name, group):
+    # records must come in priority order: a record is dropped when an earlier
+    # kept record of the same group lies within radius_m and has a name at
+    # least min_similarity alike. point/name/group read a record's
+    # (lat, lng), normalized name and group. Returns (kept records, dropped count).
+    if not radius_m or radius_m <= 0:
+        return list(records), 0
+    index = SpatialHash(radius_m)
+    kept, dropped = [], 0
+    for record in records:
+        lat, lng = point(record)
+        record_name, record_group = name(record), group(record)
+        duplicate = any(
+            other_group == record_group
+            and distance_m(lat, lng, other_lat, other_lng) <= radius_m
+            and name_similarity(record_name, other_name) >= min_similarity
+            for other_lat, other_lng, (other_group, other_name) in index.near(lat, lng)
+        )
+        if duplicate:
+            dropped += 1
+            continue
+        index.add(lat, lng, (record_group, record_name))
+        kept.append(record)
+    return kept, dropped
@@ -0,0 +1,164 @@
+# scripts/state_topology.py
+# Builds data/us-truck.topo.json: the us-states.json polygons as a quantized,
+# simplified TopoJSON topology with each state's truck metrics joined in, so
+# js/truck_map.js needs one small request instead of the GeoJSON plus us-truck.json.
+#
+# Coordinates are snapped to a QUANTIZATION x QUANTIZATION grid, rings are cut
+# into arcs wherever neighbouring states' borders meet, and shared arcs are
+# stored once. Arcs are simplified (Douglas-Peucker, endpoints fixed) after
+# being shared, so both sides of a border get the same line and no gaps or
+# overlaps appear.
+import json
+import os
+from output_format import write_payload
+
+STATES_PATH = os.path.join(os.path.dirname(__file__), '../data/us-states.json')
+TOPOLOGY_FILENAME = 'us-truck.topo.json'
+
+QUANTIZATION = 100000
+# Maximum deviation in degrees; ~1 km, invisible at the zoom levels the truck map uses
+SIMPLIFY_TOLERANCE = 0.01
+
+def polygons_of(geometry):
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    raise ValueError(f"Unsupported geometry type: {geometry['type']}")
+
+class Quantizer:
+    def __init__(self, features):
+        xs, ys = [], []
+        for feature in features:
+            for polygon in polygons_of(feature['geometry']):
+                for ring in polygon:
+                    xs.extend(pt[0] for pt in ring)
+                    ys.extend(pt[1] for pt in ring)
+        self.x0, self.y0 = min(xs), min(ys)
+        self.kx = (max(xs) - self.x0) / (QUANTIZATION - 1) or 1
+        self.ky = (max(ys) - self.y0) / (QUANTIZATION - 1) or 1
+
+    def ring(self, ring):
+        # Snapped, without consecutive duplicates, closed
+        points = []
+        for x, y in (pt[:2] for pt in ring):
+            point = (round((x - self.x0) / self.kx), round((y - self.y0) / self.ky))
+            if not points or points[-1] != point:
+                points.append(point)
+        if points[0] != points[-1]:
+            points.append(points[0])
+        return points
+
+    def transform(self):
+        return {'scale': [self.kx, self.ky], 'translate': [self.x0, self.y0]}
+
+def find_junctions(rings):
+    # A point is a junction where the set of neighbouring points changes,
+    # i.e. where two borders diverge
+    neighbours = {}
+    for ring in rings:
+        body = ring[:-1]
+        for i, point in enumerate(body):
+            neighbours.setdefault(point, set()).update((body[i - 1], body[(i + 1) % len(body)]))
+    return {point for point, near in neighbours.items() if len(near) > 2}
+
+def cut_ring(ring, junctions):
+    body = ring[:-1]
+    starts = [i for i, point in enumerate(body) if point in junctions]
+    if not starts:
+        # Free-standing ring: start at the smallest point so identical rings match
+        start = body.index(min(body))
+        closed = body[start:] + body[:start]
+        return [closed + [closed[0]]]
+    rotated = body[starts[0]:] + body[:starts[0]] + [body[starts[0]]]
+    offsets = [i - starts[0] for i in starts] + [len(body)]
+    return [rotated[a:b + 1] for a, b in zip(offsets, offsets[1:])]
+
+def perpendicular_distance2(point, start, end):
+    (px, py), (ax, ay), (bx, by) = point, start, end
+    dx, dy = bx - ax, by - ay
+    if dx == 0 and dy == 0:
+        return (px - ax) ** 2 + (py - ay) ** 2
+    t = max(0, min(1, ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)))
+    return (px - ax - t * dx) ** 2 + (py - ay - t * dy) ** 2
+
+def douglas_peucker(points, tolerance2):
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        farthest, worst = None, tolerance2
+        for i in range(first + 1, last):
+            d = perpendicular_distance2(points[i], points[first], points[last])
+            if d > worst:
+                farthest, worst = i, d
+        if farthest is not None:
+            keep[farthest] = True
+            stack.extend(((first, farthest), (farthest, last)))
+    return [point for point, kept in zip(points, keep) if kept]
+
+def simplify_arc(arc, tolerance2):
+    if arc[0] != arc[-1]:
+        return douglas_peucker(arc, tolerance2)
+    # Closed arc: split at the point farthest from the start so it keeps an area
+    far = max(range(len(arc)), key=lambda i: (arc[i][0] - arc[0][0]) ** 2 + (arc[i][1] - arc[0][1]) ** 2)
+    simplified = douglas_peucker(arc[:far + 1], tolerance2) + douglas_peucker(arc[far:], tolerance2)[1:]
+    if len(simplified) < 4:
+        # Keep at least a triangle for small islands
+        step = max(1, (len(arc) - 1) // 3)
+        simplified = arc[0:-1:step][:3] + [arc[0]]
+    return simplified
+
+def delta_encode(arc):
+    encoded = [list(arc[0])]
+    for (x0, y0), (x1, y1) in zip(arc, arc[1:]):
+        encoded.append([x1 - x0, y1 - y0])
+    return encoded
+
+def build_topology(geojson, metrics, tolerance=SIMPLIFY_TOLERANCE):
+    # metrics: us-truck.json contents, state code -> values
+    features = geojson['features']
+    quantizer = Quantizer(features)
+    shapes = [[[quantizer.ring(ring) for ring in polygon] for polygon in polygons_of(feature['geometry'])]
+              for feature in features]
+    junctions = find_junctions(ring for polygons in shapes for polygon in polygons for ring in polygon)
+
+    arcs, arc_index = [], {}
+    def arc_id(arc):
+        key = tuple(arc)
+        if key not in arc_index:
+            reverse = key[::-1]
+            if reverse in arc_index:
+                return ~arc_index[reverse]
+            arc_index[key] = len(arcs)
+            arcs.append(arc)
+        return arc_index[key]
+
+    geometries = []
+    for feature, polygons in zip(features, shapes):
+        polygon_arcs = [[[arc_id(arc) for arc in cut_ring(ring, junctions)] for ring in polygon]
+                        for polygon in polygons]
+        properties = {'name': feature['properties'].get('name')}
+        if feature.get('id') in metrics:
+            properties['metrics'] = metrics[feature['id']]
+        geometry = {'type': 'Polygon', 'arcs': polygon_arcs[0]} if len(polygon_arcs) == 1 else \
+                   {'type': 'MultiPolygon', 'arcs': polygon_arcs}
+        geometries.append({'id': feature.get('id'), 'properties': properties, **geometry})
+
+    tolerance2 = (tolerance / max(quantizer.kx, quantizer.ky)) ** 2
+    return {
+        'type': 'Topology',
+        'transform': quantizer.transform(),
+        'objects': {'states': {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': [delta_encode(simplify_arc(arc, tolerance2)) for arc in arcs],
+    }
+
+def write_state_topology(output_dir, metrics, states_path=STATES_PATH):
+    with open(states_path, encoding='utf-8') as f:
+        geojson = json.load(f)
+    topology = build_topology(geojson, metrics)
+    output_path = os.path.join(output_dir, TOPOLOGY_FILENAME)
+    data = json.dumps(topology, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    write_payload(output_path, data, 'topojson')
+    return output_path
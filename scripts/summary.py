@@ -0,0 +1,170 @@
+# scripts/summary.py
+# Rollups every consumer used to recompute from the raw points, built once per
+# refresh and written to <output>.summary.json next to the output:
+#   count  - records summarized
+#   groups - per rollup, per group value (a single 'all' group when the rollup
+#            has no group): the record count, value counts of each counted
+#            field, count/mean/min/max/percentiles of each numeric field and
+#            the worst records by a score field
+# Percentiles come from one KLL sketch per group and field, so memory stays
+# bounded however many records stream through; they are exact up to
+# SKETCH_K values and within about 1% of rank beyond.
+import heapq
+import json
+import math
+import os
+import random
+from collections import Counter, namedtuple
+from cluster_index import is_number
+from map_layout import sort_key
+from output_format import write_payload
+
+PERCENTILES = (50, 90, 95, 99)
+SKETCH_K = 200
+WORST_COUNT = 5
+
+# group: function(record) -> group value, or None for one 'all' group
+# counts: name -> function(record) returning the value to count
+# stats: name -> function(record) returning a number (anything else is skipped)
+# worst: records with the highest score kept per group
+Rollup = namedtuple('Rollup', ['group', 'counts', 'stats', 'worst'], defaults=(None, None, None, None))
+# score: function(record) -> number; fields: what each worst entry lists
+Worst = namedtuple('Worst', ['score', 'fields', 'n'], defaults=(WORST_COUNT,))
+
+def value_order(value):
+    # Numbers in numeric order, ahead of text in dropdown order
+    return (0, value, ()) if is_number(value) else (1, 0, sort_key(str(value)))
+
+def summary_path(output_path):
+    root, ext = os.path.splitext(output_path)
+    return f"{root}.summary{ext}"
+
+class QuantileSketch:
+    # KLL sketch: compactors of shrinking capacity, where each item at level h
+    # stands for 2**h values. A full level is sorted and every other item moves
+    # up a level. Seeded, so the same values always give the same summary.
+    def __init__(self, k=SKETCH_K, seed=0):
+        self.k = k
+        self.count = 0
+        self._levels = [[]]
+        self._random = random.Random(seed)
+
+    def capacity(self, level):
+        return max(int(math.ceil(self.k * (2 / 3) ** (len(self._levels) - level - 1))), 2)
+
+    def add(self, value):
+        self.count += 1
+        self._levels[0].append(value)
+        if len(self._levels[0]) >= self.capacity(0):
+            self.compact()
+
+    def compact(self):
+        for level, items in enumerate(self._levels):
+            if len(items) < self.capacity(level):
+                continue
+            if level + 1 == len(self._levels):
+                self._levels.append([])
+            items.sort()
+            # An odd item out stays behind
+            kept = [items.pop()] if len(items) % 2 else []
+            self._levels[level + 1].extend(items[self._random.randint(0, 1)::2])
+            self._levels[level] = kept
+
+    def quantiles(self, fractions):
+        # Nearest-rank value for each fraction in 0..1
+        weighted = sorted((value, 1 << level) for level, items in enumerate(self._levels) for value in items)
+        total = sum(weight for _, weight in weighted)
+        results = []
+        for fraction in fractions:
+            rank = max(fraction * total, 1)
+            seen = 0
+            for value, weight in weighted:
+                seen += weight
+                if seen >= rank:
+                    break
+            results.append(value)
+        return results
+
+class FieldStats:
+    def __init__(self):
+        self.sketch = QuantileSketch()
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def add(self, value):
+        self.sketch.add(value)
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def as_dict(self):
+        stats = {'count': self.sketch.count, 'mean': round(self.total / self.sketch.count, 6),
+                 'min': self.minimum, 'max': self.maximum}
+        percentiles = self.sketch.quantiles([p / 100 for p in PERCENTILES])
+        stats.update((f"p{p}", value) for p, value in zip(PERCENTILES, percentiles))
+        return stats
+
+class GroupSummary:
+    def __init__(self, rollup):
+        self.rollup = rollup
+        self.count = 0
+        self.counts = {name: Counter() for name in rollup.counts or {}}
+        self.stats = {name: FieldStats() for name in rollup.stats or {}}
+        self.worst = []
+
+    def add(self, index, record):
+        self.count += 1
+        for name, value_of in (self.rollup.counts or {}).items():
+            value = value_of(record)
+            if value is not None and value != '':
+                self.counts[name][value] += 1
+        for name, value_of in (self.rollup.stats or {}).items():
+            value = value_of(record)
+            if is_number(value) and math.isfinite(value):
+                self.stats[name].add(value)
+        worst = self.rollup.worst
+        if worst is not None:
+            score = worst.score(record)
+            if is_number(score):
+                # Earlier records win ties
+                entry = (score, -index, {field: record.get(field) for field in worst.fields})
+                if len(self.worst) < worst.n:
+                    heapq.heappush(self.worst, entry)
+                elif entry[:2] > self.worst[0][:2]:
+                    heapq.heapreplace(self.worst, entry)
+
+    def as_dict(self):
+        group = {'count': self.count}
+        if self.counts:
+            group['counts'] = {name: dict(sorted(counter.items(), key=lambda item: value_order(item[0])))
+                               for name, counter in self.counts.items()}
+        if self.stats:
+            group['stats'] = {name: stats.as_dict() for name, stats in self.stats.items() if stats.sketch.count}
+        if self.rollup.worst is not None:
+            group['worst'] = [fields for _, _, fields in sorted(self.worst, key=lambda entry: entry[:2], reverse=True)]
+        return group
+
+def summarize(records, rollups):
+    # rollups: name -> Rollup. One pass over the records.
+    groups = {name: {} for name in rollups}
+    for index, record in enumerate(records):
+        for name, rollup in rollups.items():
+            key = 'all' if rollup.group is None else rollup.group(record)
+            if key is None or key == '':
+                continue
+            group = groups[name].get(key)
+            if group is None:
+                group = groups[name][key] = GroupSummary(rollup)
+            group.add(index, record)
+    return {
+        'count': len(records),
+        'groups': {name: {key: by_key[key].as_dict() for key in sorted(by_key, key=value_order)}
+                   for name, by_key in groups.items()},
+    }
+
+def write_summary(output_path, records, rollups):
+    summary = summarize(records, rollups)
+    data = json.dumps(summary, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    write_payload(summary_path(output_path), data, f"summary ({sum(map(len, summary['groups'].values()))} groups)")
+    return summary
@@ -0,0 +1,66 @@
+# scripts/tiling.py
+# Tiled copy of the point outputs for viewport-only loading: records are bucketed
+# into web-mercator z/x/y tiles at TILE_ZOOM (default 4, "off" disables tiling) and
+# written to data/tiles/<name>/<z>/<x>/<y>.json in the current OUTPUT_FORMAT, next
+# to a manifest.json listing the non-empty tiles and their record counts.
+import json
+import math
+import os
+import shutil
+from cluster_index import is_number, project
+from output_format import write_output
+
+DEFAULT_TILE_ZOOM = 4
+
+def tile_zoom():
+    zoom = os.environ.get('TILE_ZOOM', str(DEFAULT_TILE_ZOOM))
+    if zoom == 'off':
+        return None
+    if not zoom.isdigit() or int(zoom) > 22:
+        raise ValueError(f"Invalid TILE_ZOOM: {zoom}")
+    return int(zoom)
+
+def tile_for(lat, lng, zoom):
+    x, y = project(lat, lng)
+    n = 2 ** zoom
+    return min(n - 1, max(0, math.floor(x * n))), min(n - 1, max(0, math.floor(y * n)))
+
+def tiles_dir(output_path):
+    name = os.path.splitext(os.path.basename(output_path))[0]
+    return os.path.join(os.path.dirname(output_path), 'tiles', name)
+
+def write_tiles(output_path, records, coordinates=('lat', 'lng'), drop=(), dictionary=()):
+    # coordinates: the (lat, lng) field names; records without numeric coordinates are left out
+    zoom = tile_zoom()
+    target = tiles_dir(output_path)
+    if zoom is None:
+        shutil.rmtree(target, ignore_errors=True)
+        return
+
+    lat_field, lng_field = coordinates
+    tiles = {}
+    for record in records:
+        lat, lng = record.get(lat_field), record.get(lng_field)
+        if is_number(lat) and is_number(lng):
+            tiles.setdefault(tile_for(lat, lng, zoom), []).append(record)
+
+    # Build into a scratch directory and swap it in, so no stale tiles survive
+    staging = f"{target}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    for (x, y), tile in sorted(tiles.items()):
+        write_output(os.path.join(staging, str(zoom), str(x), f"{y}.json"), tile,
+                     drop=drop, dictionary=dictionary, verbose=False)
+
+    manifest = {
+        'source': os.path.basename(output_path),
+        'zoom': zoom,
+        'count': sum(len(tile) for tile in tiles.values()),
+        'tiles': {f"{x}/{y}": len(tile) for (x, y), tile in sorted(tiles.items())},
+    }
+    os.makedirs(staging, exist_ok=True)
+    with open(os.path.join(staging, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    print(f"🗺️ Wrote {len(tiles)} zoom-{zoom} tiles to {os.path.relpath(target, os.path.dirname(output_path))}")
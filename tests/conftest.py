@@ -0,0 +1,15 @@
+# tests/conftest.py
+# The scripts are flat modules run from scripts/, so tests import them the same way
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    # Outputs, fingerprints, history and metrics of a test stay in tmp_path
+    monkeypatch.setenv('FETCH_DATA_DIR', str(tmp_path))
+    for key in ('FETCH_STATE_PATH', 'HISTORY_PATH', 'FETCH_METRICS_PATH', 'FETCH_SOURCE', 'SHEET_PAGE_ROWS'):
+        monkeypatch.delenv(key, raising=False)
+    return tmp_path
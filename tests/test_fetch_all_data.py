@@ -0,0 +1,22 @@
+# tests/test_fetch_all_data.py
+# A failing mode fails the run, but never keeps the other modes from publishing
+import csv
+from fake_sheets import generate_workbook
+from fetch_all_data import main
+
+def test_failed_mode_fails_the_run_after_the_others_publish(data_dir, tmp_path, monkeypatch):
+    # Local exports where CONGESTION_AIR went missing, like a renamed worksheet
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    for title, rows in generate_workbook(20).items():
+        if title != 'CONGESTION_AIR':
+            with open(exports / f"{title}.csv", 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerows(rows)
+    github_output = tmp_path / 'github_output'
+    monkeypatch.setenv('GITHUB_OUTPUT', str(github_output))
+
+    assert main(['--source', str(exports)]) == 1
+    for name in ('us-truck.json', 'us-rail.json', 'global-ports.json'):
+        assert (data_dir / name).exists()
+    assert not (data_dir / 'us-air.json').exists()
+    assert github_output.read_text().splitlines() == ['changed=truck,rail,ocean', 'failed=air']
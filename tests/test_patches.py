@@ -0,0 +1,82 @@
+# tests/test_patches.py
+# Every published record is an entity, so the base of one run plus the patch of
+# the next rebuilds the file the next run published.
+import copy
+import json
+import os
+import shutil
+import pytest
+from fake_sheets import FakeSpreadsheet, generate_workbook
+from sheet_access import SheetReader
+from change_detection import FingerprintStore
+from history_store import HistoryStore
+from output_format import read_output
+from patches import key_entities, patch_dir
+from fetch_all_data import FETCHERS
+from fetch_ocean_data import transform_ocean
+
+OUTPUTS = {'truck': 'us-truck.json', 'rail': 'us-rail.json', 'ocean': 'global-ports.json', 'air': 'us-air.json'}
+
+def apply_patch(entities, patch):
+    for key in patch['removed']:
+        del entities[key]
+    entities.update(patch['added'])
+    for key, fields in patch['changed'].items():
+        entities[key].update(fields)
+    for key, fields in patch.get('unset', {}).items():
+        for field in fields:
+            del entities[key][field]
+    return entities
+
+def edited(workbook):
+    # The next hour's sheet: a few rows gone, some values changed, a few rows new
+    later = generate_workbook(10, seed=1)
+    result = copy.deepcopy(workbook)
+    for title, values in result.items():
+        del values[1:6]
+        for row in values[10:30]:
+            row[-1] = '7'
+        values.extend(later[title][1:])
+    return result
+
+def canonical(records):
+    return sorted(json.dumps(record, sort_keys=True) for record in records)
+
+def test_shared_keys_get_a_suffix_instead_of_overwriting():
+    records = [{'port_code': 'P1', 'n': 1}, {'port_code': 'P2', 'n': 2}, {'port_code': 'P1', 'n': 3},
+               {'port_code': 'P1', 'n': 4}]
+    entities = key_entities(records, lambda record: record['port_code'])
+    assert entities == {'P1': records[0], 'P2': records[1], 'P1#2': records[2], 'P1#3': records[3]}
+
+def test_every_ocean_record_is_an_entity():
+    result = transform_ocean(generate_workbook(300)['CONGESTION_OCEAN'])
+    keys = [record['port_code'] for record in result]
+    assert len(set(keys)) < len(keys)
+    assert len(key_entities(result, lambda record: record['port_code'])) == len(result)
+
+@pytest.mark.parametrize('output_format', ['pretty', 'columns'])
+@pytest.mark.parametrize('mode', list(FETCHERS))
+def test_base_plus_patch_rebuilds_the_published_file(data_dir, tmp_path, monkeypatch, mode, output_format):
+    monkeypatch.setenv('OUTPUT_FORMAT', output_format)
+    output_path = os.path.join(data_dir, OUTPUTS[mode])
+    base_path = os.path.join(patch_dir(output_path), 'base.json')
+    fingerprints, history = FingerprintStore(), HistoryStore()
+
+    workbook = generate_workbook(300)
+    assert FETCHERS[mode](SheetReader(FakeSpreadsheet(workbook)), fingerprints, history)
+    shutil.copy(base_path, tmp_path / 'base_v1.json')
+    assert FETCHERS[mode](SheetReader(FakeSpreadsheet(edited(workbook))), fingerprints, history)
+
+    with open(tmp_path / 'base_v1.json', encoding='utf-8') as f:
+        base = json.load(f)
+    with open(os.path.join(patch_dir(output_path), '2.json'), encoding='utf-8') as f:
+        patch = json.load(f)
+    assert (base['version'], patch['from'], patch['to']) == (1, 1, 2)
+    assert patch['changed']
+    rebuilt = apply_patch(base['entities'], patch)
+
+    published = read_output(output_path)
+    if isinstance(published, dict):
+        assert rebuilt == published
+    else:
+        assert canonical(rebuilt.values()) == canonical(published)
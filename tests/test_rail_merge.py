@@ -0,0 +1,119 @@
+# tests/test_rail_merge.py
+# transform_rail's single priority-merge pass against the tier-by-tier loop it
+# replaced, with the proximity pass off (RAIL_DEDUP_RADIUS_M=0) so only the
+# exact-key tie rules decide
+import pytest
+from fake_sheets import generate_workbook
+from fetch_rail_data import get_congestion_level_from_dwell_time, rail_dedup_key, transform_rail
+from row_decoder import decimal, text
+
+RAIL_HEADERS = ['Railroad', 'Location', 'Yard', 'Latitude', 'Longitude', 'Date', 'Dwell Time', 'Average',
+                'Indicator', 'Category']
+RAIL2_HEADERS = ['Railroad Company', 'Location', 'Latitude', 'Longitude', 'Rightmost Dwell Time',
+                 'Date of Rightmost Value']
+
+@pytest.fixture(autouse=True)
+def exact_keys_only(monkeypatch):
+    monkeypatch.setenv('RAIL_DEDUP_RADIUS_M', '0')
+
+def summary(records):
+    return [(r['company'], r['location'], r['dwell_time']) for r in records]
+
+def test_tie_rules():
+    rail = [
+        RAIL_HEADERS,
+        ['BNSF', 'Barstow', '', '34.9', '-117.0', '2026-10-01', '20.5', '19', '1.1', 'High'],
+        ['BNSF', 'Barstow', '', '34.9', '-117.0', '2026-10-02', '22', '19', '1.2', 'High'],
+        ['UP', 'Barstow', '', '34.9', '-117.0', '2026-10-01', '14', '15', '0.9', 'Low'],
+        # Same key: company is keyed upper-case, the name without punctuation, coordinates to 5 places
+        ['Bnsf', 'barstow!', '', '34.900001', '-117.0', '2026-10-03', '24', '19', '1.3', 'Very High'],
+        ['CSX', '', 'Yard Only', '39.0', '-77.0', '2026-10-01', '9', '10', '0.8', 'Low'],
+    ]
+    rail2 = [
+        RAIL2_HEADERS,
+        ['CPKC', 'Kansas City', '39.1', '-94.6', '25', '2026-10-01'],
+        ['CPKC', 'Kansas City', '39.1', '-94.6', '30', '2026-10-02'],
+        ['CP', 'Kansas City', '39.1', '-94.6', '31', '2026-10-02'],
+        ['KCS', 'Shreveport', '32.5', '-93.7', '12', '2026-10-01'],
+        ['CP', 'Shreveport', '32.5', '-93.7', '13', '2026-10-02'],
+        ['BNSF', 'Barstow', '34.9', '-117.0', '15', '2026-10-01'],
+        # Tier companies match exactly, so these fall to the last tier, keyed as CPKC all the same
+        ['cpkc', 'Laredo', '27.5', '-99.5', '9', '2026-10-01'],
+        ['Cpkc', 'Laredo', '27.5', '-99.5', '10', '2026-10-02'],
+        ['KCS', 'Laredo', '27.5', '-99.5', '11', '2026-10-03'],
+        ['NS', 'Pittsburgh', '', '-80.0', '7', '2026-10-01'],
+        ['NS', 'Conway', '40.6', '-80.2', '5', '2026-10-01'],
+    ]
+    result = transform_rail({'CONGESTION_RAIL': rail, 'CONGESTION_RAIL2': rail2})
+    assert summary(result) == [
+        # CONGESTION_RAIL: the last row of a key wins, in the place of the first
+        ('Bnsf', 'barstow!', 24.0),
+        ('UP', 'Barstow', 14.0),
+        ('CSX', 'Yard Only', 9.0),
+        # CONGESTION_RAIL2 tiers: the first row of a key wins, a higher tier beats a lower one
+        ('CPKC', 'Kansas City', 25.0),
+        ('CPKC', 'Shreveport', 12.0),
+        ('CPKC', 'Laredo', 11.0),
+        ('NS', 'Conway', 5.0),
+    ]
+    assert result[0] == {
+        'date': '2026-10-03', 'company': 'Bnsf', 'location': 'barstow!', 'Yard': 'barstow!',
+        'lat': 34.900001, 'lng': -117.0, 'dwell_time': 24.0, 'Average': 19.0, 'indicator': 1.3,
+        'congestion_level': 'Very High',
+    }
+    assert result[3] == {
+        'date': '2026-10-01', 'company': 'CPKC', 'location': 'Kansas City', 'Yard': 'Kansas City',
+        'lat': 39.1, 'lng': -94.6, 'dwell_time': 25.0, 'Average': None, 'indicator': None,
+        'congestion_level': 'High',
+    }
+
+def tiered_reference(rail, rail2):
+    # The loop transform_rail replaced: CONGESTION_RAIL first (a later row
+    # overwrites its key), then CONGESTION_RAIL2 once per tier, CPKC, CP/KCS as
+    # CPKC, then the rest, each adding only keys nobody has yet
+    processed = {}
+    headers, *rows = rail
+    for row in rows:
+        row = dict(zip(headers, row))
+        lat, lng = decimal(row.get('Latitude')), decimal(row.get('Longitude'))
+        location = text(row.get('Location')) or text(row.get('Yard'))
+        company = text(row.get('Railroad'))
+        if lat is None or lng is None or not location:
+            continue
+        processed[rail_dedup_key(location, lat, lng, company)] = {
+            'date': text(row.get('Date')), 'company': company, 'location': location, 'Yard': location,
+            'lat': lat, 'lng': lng, 'dwell_time': decimal(row.get('Dwell Time')),
+            'Average': decimal(row.get('Average')), 'indicator': decimal(row.get('Indicator')),
+            'congestion_level': row.get('Category', 'Unknown'),
+        }
+    headers, *rows = rail2
+    rows = [dict(zip(headers, row)) for row in rows]
+    tiers = [(lambda c: c == 'CPKC', None), (lambda c: c in ('CP', 'KCS'), 'CPKC'),
+             (lambda c: c not in ('CPKC', 'CP', 'KCS'), None)]
+    for in_tier, alias in tiers:
+        for row in rows:
+            company = text(row.get('Railroad Company'))
+            if not in_tier(company):
+                continue
+            lat, lng = decimal(row.get('Latitude')), decimal(row.get('Longitude'))
+            location = text(row.get('Location'))
+            dwell_time = decimal(row.get('Rightmost Dwell Time'))
+            if lat is None or lng is None or dwell_time is None or not location:
+                continue
+            key = rail_dedup_key(location, lat, lng, alias or company)
+            if key not in processed:
+                processed[key] = {
+                    'date': text(row.get('Date of Rightmost Value')), 'company': alias or company,
+                    'location': location, 'Yard': location, 'lat': lat, 'lng': lng, 'dwell_time': dwell_time,
+                    'Average': None, 'indicator': None,
+                    'congestion_level': get_congestion_level_from_dwell_time(dwell_time),
+                }
+    return list(processed.values())
+
+@pytest.mark.parametrize('rows', [50, 2000])
+def test_matches_the_tiered_loop_on_generated_sheets(rows):
+    workbook = generate_workbook(rows)
+    rail, rail2 = workbook['CONGESTION_RAIL'], workbook['CONGESTION_RAIL2']
+    result = transform_rail({'CONGESTION_RAIL': rail, 'CONGESTION_RAIL2': rail2})
+    assert result == tiered_reference(rail, rail2)
+    assert len(result) < len(rail) + len(rail2) - 2
@@ -0,0 +1,126 @@
+# tests/test_refresh_daemon.py
+# RefreshDaemon serving what it refreshed from the fake_sheets stand-in:
+# coding negotiation and ETags through respond(), HEAD and keep-alive through
+# a live server, and the cached file reloading once a refresh rewrites it
+import asyncio
+import gzip
+import pytest
+from fake_sheets import FakeSpreadsheet, generate_workbook
+from refresh_daemon import RefreshDaemon
+
+RAIL_URL = '/data/us-rail.json'
+
+@pytest.fixture
+def daemon(data_dir):
+    daemon = RefreshDaemon(FakeSpreadsheet(generate_workbook(50)), ['rail'], {'rail': 60})
+    assert daemon.refresh('rail') == (True, True)
+    # A precompressed sibling, as OUTPUT_COMPRESSION=br would write it
+    with open(data_dir / 'us-rail.json.br', 'wb') as f:
+        f.write(b'brotli body')
+    return daemon
+
+def get(daemon, target, method='GET', **headers):
+    return asyncio.run(daemon.respond(method, target, {name.replace('_', '-'): value for name, value in headers.items()}))
+
+def published(data_dir):
+    with open(data_dir / 'us-rail.json', 'rb') as f:
+        return f.read()
+
+@pytest.mark.parametrize('accept, coding', [
+    (None, 'identity'),
+    ('gzip, deflate, br', 'br'),
+    ('gzip', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('gzip;q=0', 'identity'),
+    ('*', 'br'),
+    ('*;q=0', 'identity'),
+    ('GZIP;q=0.5', 'gzip'),
+])
+def test_negotiates_the_content_coding(daemon, data_dir, accept, coding):
+    headers = {} if accept is None else {'accept_encoding': accept}
+    status, response_headers, body = get(daemon, RAIL_URL, **headers)
+    assert status == 200
+    assert response_headers.get('Content-Encoding', 'identity') == coding
+    assert response_headers['Vary'] == 'Accept-Encoding'
+    assert response_headers['Content-Type'] == 'application/json; charset=utf-8'
+    if coding == 'br':
+        assert body == b'brotli body'
+    elif coding == 'gzip':
+        assert gzip.decompress(body) == published(data_dir)
+    else:
+        assert body == published(data_dir)
+
+def test_every_coding_has_its_own_etag(daemon):
+    etags = {coding: get(daemon, RAIL_URL, accept_encoding=coding)[1]['ETag'] for coding in ('identity', 'gzip', 'br')}
+    assert len(set(etags.values())) == 3
+
+    # A validator only matches the representation it came from
+    status, headers, body = get(daemon, RAIL_URL, accept_encoding='gzip', if_none_match=etags['gzip'])
+    assert (status, headers['ETag'], body) == (304, etags['gzip'], b'')
+    assert get(daemon, RAIL_URL, accept_encoding='br', if_none_match=etags['gzip'])[0] == 200
+    assert get(daemon, RAIL_URL, if_none_match=etags['identity'])[0] == 304
+    # Weak comparison, lists and '*'
+    assert get(daemon, RAIL_URL, if_none_match=f"W/{etags['identity']}")[0] == 304
+    assert get(daemon, RAIL_URL, accept_encoding='gzip', if_none_match=f'"other", {etags["gzip"]}')[0] == 304
+    assert get(daemon, RAIL_URL, if_none_match='*')[0] == 304
+
+def test_refuses_other_methods_and_hidden_files(daemon):
+    assert get(daemon, RAIL_URL, method='POST')[:2] == (405, {'Allow': 'GET, HEAD'})
+    assert get(daemon, '/data/.history.sqlite')[0] == 404
+    assert get(daemon, '/data/../scripts/sheets.py')[0] == 404
+    assert get(daemon, '/data/missing.json')[0] == 404
+
+def test_refresh_reloads_the_cached_file(daemon, data_dir):
+    status, headers, body = get(daemon, RAIL_URL)
+    assert body == published(data_dir)
+
+    # The sheet changes: the next poll rewrites the file and the cache follows
+    for row in daemon.sheet.worksheets['CONGESTION_RAIL'][1:]:
+        row[-1] = 'Very High'
+    assert daemon.refresh('rail') == (True, True)
+    reloaded, reloaded_headers, reloaded_body = get(daemon, RAIL_URL, if_none_match=headers['ETag'])
+    assert reloaded == 200
+    assert reloaded_headers['ETag'] != headers['ETag']
+    assert reloaded_body == published(data_dir) != body
+    # The .br sibling predates the new file, so it is no longer served
+    assert get(daemon, RAIL_URL, accept_encoding='br')[1].get('Content-Encoding') != 'br'
+
+    # An unchanged poll leaves the file, and so the ETag, alone
+    assert daemon.refresh('rail') == (True, False)
+    assert get(daemon, RAIL_URL)[1]['ETag'] == reloaded_headers['ETag']
+
+async def read_response(reader):
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1')
+    status_line, *lines = head.strip().split('\r\n')
+    headers = {name.lower(): value.strip() for name, _, value in (line.partition(':') for line in lines)}
+    return int(status_line.split()[1]), headers
+
+def test_live_server_keeps_the_connection_alive(daemon, data_dir):
+    async def session():
+        server = await asyncio.start_server(daemon.handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            # HEAD: the GET headers, no body
+            writer.write(f"HEAD {RAIL_URL} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            status, head = await read_response(reader)
+            assert (status, head['connection']) == (200, 'keep-alive')
+            assert int(head['content-length']) == len(published(data_dir))
+
+            # Same connection: the next bytes are the GET response, not a HEAD body
+            writer.write(f"GET {RAIL_URL} HTTP/1.1\r\nHost: localhost\r\nAccept-Encoding: gzip\r\n\r\n".encode())
+            status, headers = await read_response(reader)
+            body = await reader.readexactly(int(headers['content-length']))
+            assert (status, headers['content-encoding']) == (200, 'gzip')
+            assert gzip.decompress(body) == published(data_dir)
+
+            writer.write(f"GET {RAIL_URL} HTTP/1.1\r\nIf-None-Match: {head['etag']}\r\n"
+                         "Connection: close\r\n\r\n".encode())
+            status, headers = await read_response(reader)
+            assert (status, headers['connection']) == (304, 'close')
+            assert 'content-length' not in headers
+            # The server hangs up after a Connection: close request
+            assert await reader.read() == b''
+            writer.close()
+
+    asyncio.run(session())
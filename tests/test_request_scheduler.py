@@ -0,0 +1,134 @@
+# tests/test_request_scheduler.py
+# RequestScheduler.call against the fake_sheets stand-in answering 429/5xx,
+# with time.sleep recorded instead of slept
+import threading
+import time
+import pytest
+import request_scheduler
+from fake_sheets import FakeAPIError, FakeSpreadsheet, generate_workbook
+from metrics import RUN_METRICS
+from request_scheduler import DeadlineExceeded, RequestScheduler
+
+RANGES = ["'CONGESTION_TRUCK'"]
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(request_scheduler.time, 'sleep', delays.append)
+    RUN_METRICS.reset()
+    return delays
+
+@pytest.fixture
+def sheet():
+    return FakeSpreadsheet(generate_workbook(5))
+
+def failing(sheet, errors):
+    # The sheet's batch get, failing with each of errors in turn before it answers
+    errors = list(errors)
+    def request():
+        if errors:
+            sheet.failures += 1
+            raise errors.pop(0)
+        return sheet.values_batch_get(RANGES)
+    return request
+
+def counters(mode):
+    return RUN_METRICS.as_dict()['modes'][mode]['counters']
+
+def test_transient_errors_are_retried_until_the_request_succeeds(sheet, sleeps):
+    scheduler = RequestScheduler(quota_per_minute=0)
+    response = scheduler.call(failing(sheet, [FakeAPIError(503), FakeAPIError(500)]), 'truck')
+    assert response['valueRanges'][0]['values'][0][0] == 'Code'
+    assert (sheet.failures, sheet.calls) == (2, 1)
+    assert len(sleeps) == 2
+    assert counters('truck') == {'api_requests': 3, 'api_retries': 2}
+
+def test_retries_stop_after_max_attempts(sleeps):
+    sheet = FakeSpreadsheet(generate_workbook(5), error_rate=1.0)
+    scheduler = RequestScheduler(quota_per_minute=0, max_attempts=4)
+    with pytest.raises(FakeAPIError):
+        scheduler.call(lambda: sheet.values_batch_get(RANGES), 'rail')
+    assert sheet.calls == sheet.failures == 4
+    assert len(sleeps) == 3
+
+def test_client_errors_are_not_retried(sheet, sleeps):
+    scheduler = RequestScheduler(quota_per_minute=0)
+    with pytest.raises(FakeAPIError):
+        scheduler.call(failing(sheet, [FakeAPIError(400)]), 'air')
+    assert sheet.failures == 1
+    assert sleeps == []
+
+def test_backoff_doubles_with_jitter(sheet, sleeps):
+    scheduler = RequestScheduler(quota_per_minute=0)
+    scheduler.call(failing(sheet, [FakeAPIError(503)] * 4), 'ocean')
+    for attempt, delay in enumerate(sleeps, start=1):
+        ceiling = min(request_scheduler.BACKOFF_CAP_SECONDS, request_scheduler.BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+        assert ceiling / 2 <= delay <= ceiling
+
+def test_retry_after_overrides_the_backoff(sheet, sleeps):
+    scheduler = RequestScheduler(quota_per_minute=0)
+    scheduler.call(failing(sheet, [FakeAPIError(429, retry_after=7.5), FakeAPIError(503, retry_after=0)]), 'truck')
+    assert sleeps == [7.5, 0.0]
+
+def test_429_empties_the_bucket_for_every_mode(sheet, sleeps):
+    scheduler = RequestScheduler(quota_per_minute=600)
+    scheduler.call(failing(sheet, [FakeAPIError(429, retry_after=0)]), 'truck')
+    # Refilled only since the 429, then spent on the retry
+    assert scheduler._tokens < 1
+
+def test_retry_past_the_deadline_raises(sheet, sleeps):
+    scheduler = RequestScheduler(quota_per_minute=0, deadline_seconds=5)
+    with pytest.raises(DeadlineExceeded):
+        scheduler.call(failing(sheet, [FakeAPIError(429, retry_after=10)]), 'rail')
+    assert (sheet.failures, sheet.calls) == (1, 0)
+    assert sleeps == []
+
+def test_waiting_for_quota_past_the_deadline_raises(sheet, sleeps):
+    scheduler = RequestScheduler(quota_per_minute=60, deadline_seconds=0.05)
+    scheduler.throttled()
+    with pytest.raises(DeadlineExceeded):
+        scheduler.call(lambda: sheet.values_batch_get(RANGES), 'air')
+    assert sheet.calls == 0
+
+def test_infinite_deadline_waits_for_tokens(sheet, sleeps):
+    # The refresh daemon runs without a deadline; queued waiters must not fail
+    scheduler = RequestScheduler(quota_per_minute=6000, deadline_seconds=float('inf'))
+    scheduler.throttled()
+    errors = []
+    def call():
+        try:
+            scheduler.call(lambda: sheet.values_batch_get(RANGES), 'rail')
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert errors == []
+    assert sheet.calls == 4
+
+def wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+def test_queued_requests_are_served_by_mode_priority(sheet):
+    scheduler = RequestScheduler(quota_per_minute=60)
+    scheduler.throttled()
+    served = []
+    threads = []
+    # Queued in the reverse of their priority
+    for mode in ('rail', 'ocean', 'truck'):
+        threads.append(threading.Thread(target=scheduler.call, args=(lambda mode=mode: served.append(mode), mode)))
+        threads[-1].start()
+        wait_until(lambda: len(scheduler._waiting) == len(threads))
+    # One token at a time, well before the bucket refills one by itself
+    for n in range(1, len(threads) + 1):
+        with scheduler._cond:
+            scheduler._tokens += 1
+            scheduler._cond.notify_all()
+        wait_until(lambda: len(served) == n)
+    for thread in threads:
+        thread.join(5)
+    assert served == ['truck', 'ocean', 'rail']
@@ -0,0 +1,38 @@
+# tests/test_sheet_access.py
+# Request counts against the fake_sheets stand-in: every worksheet of a run
+# comes from one values_batch_get call while it fits in a page.
+import pytest
+from fake_sheets import FakeSpreadsheet, generate_workbook
+from sheet_access import SheetReader
+from change_detection import FingerprintStore
+from history_store import HistoryStore
+from fetch_all_data import FETCHERS, fetch_all_data
+
+def test_fetch_all_data_reads_every_worksheet_in_one_request(data_dir):
+    sheet = FakeSpreadsheet(generate_workbook(50))
+    results = fetch_all_data(sheet=sheet)
+    assert results == {mode: True for mode in FETCHERS}
+    assert sheet.calls == 1
+
+@pytest.mark.parametrize('mode', list(FETCHERS))
+def test_single_fetcher_reads_its_worksheets_in_one_request(data_dir, mode):
+    sheet = FakeSpreadsheet(generate_workbook(50))
+    assert FETCHERS[mode](SheetReader(sheet), FingerprintStore(), HistoryStore())
+    assert sheet.calls == 1
+
+def test_unchanged_run_reads_once_and_skips_the_transform(data_dir):
+    workbook = generate_workbook(50)
+    fetch_all_data(sheet=FakeSpreadsheet(workbook))
+    fingerprints = FingerprintStore()
+    sheet = FakeSpreadsheet(workbook)
+    assert all(fetch_all_data(sheet=sheet, fingerprints=fingerprints).values())
+    assert sheet.calls == 1
+    assert fingerprints.changed == {mode: False for mode in FETCHERS}
+
+def test_worksheets_larger_than_a_page_are_read_page_by_page(data_dir):
+    sheet = FakeSpreadsheet(generate_workbook(50))
+    reader = SheetReader(sheet, rows_per_page=20)
+    rows = list(reader.rows("'CONGESTION_TRUCK'"))
+    assert rows == sheet.worksheets['CONGESTION_TRUCK']
+    # 51 rows: pages of 20, 20 and 11, the last one clipped to the grid
+    assert sheet.calls == 3